@@ -0,0 +1,115 @@
+import pandas as pd
+
+from instrumentation import StageTimer
+from workbook import get_workbook
+
+# Data model audit engine. The four data model sheets are loaded once into
+# compact columns (names as categoricals), and every registered check runs on
+# them with vectorized set operations and groupbys.
+
+# Audit sheet -> columns the checks read
+AUDIT_SHEETS = {
+    "ENTITIES": ["NAME"],
+    "RELATIONSHIPS": ["NAME"],
+    "ATTRIBUTES": ["NAME", "DISPLAY TYPE", "GROUP", "IS NESTED GROUP IDENTIFIER?"],
+    "E-A-R MODEL": ["ENTITY", "MAPPED ATTRIBUTE", "MAPPED RELATIONSHIP"],
+}
+
+# Check title -> check function, in report order
+AUDIT_CHECKS = {}
+
+
+# Register fn(frames) as an audit check. It gets the frames from
+# load_audit_frames and returns the names it flags, sorted.
+def audit_check(title):
+    def register(fn):
+        AUDIT_CHECKS[title] = fn
+        return fn
+    return register
+
+
+# A column as a categorical of text, built from one factorize pass instead of
+# a converted copy of every cell. Blank cells stay NaN.
+def _compact(series):
+    codes, uniques = pd.factorize(series)
+    if all(isinstance(value, str) for value in uniques):
+        names = pd.Index(uniques)
+    else:
+        names = pd.Index([str(value) for value in uniques], dtype=object)
+    if not names.is_unique:
+        # Values that only differ in type (1 and "1") become the same name
+        return series.where(series.isna(), series.astype(str)).astype("category")
+    return pd.Series(pd.Categorical.from_codes(codes, names), index=series.index, name=series.name)
+
+
+# Distinct non-blank values of a compact column, as an Index of text
+def _distinct(series):
+    codes = pd.unique(series.cat.codes.to_numpy())
+    return series.cat.categories[codes[codes >= 0]]
+
+
+# Every audit sheet read once, as compact frames keyed by sheet name. Every
+# column is a text categorical; blank cells are kept as NaN.
+def load_audit_frames(file):
+    model = get_workbook(file)
+    frames = {}
+    for sheet, columns in AUDIT_SHEETS.items():
+        df = model.sheet(sheet, columns)
+        frames[sheet] = pd.DataFrame({col: _compact(df[col]) for col in columns})
+    return frames
+
+
+def _sorted_difference(names, used):
+    return sorted(_distinct(names).difference(_distinct(used), sort=False))
+
+
+@audit_check("Unused Entities")
+def unused_entities(frames):
+    return _sorted_difference(frames["ENTITIES"]["NAME"], frames["E-A-R MODEL"]["ENTITY"])
+
+
+@audit_check("Unused Relationships")
+def unused_relationships(frames):
+    return _sorted_difference(frames["RELATIONSHIPS"]["NAME"], frames["E-A-R MODEL"]["MAPPED RELATIONSHIP"])
+
+
+def _nested_parents(frames):
+    df_attributes = frames["ATTRIBUTES"]
+    return _distinct(df_attributes.loc[df_attributes["DISPLAY TYPE"] == "nestedgrid", "NAME"])
+
+
+# Attributes neither mapped in the E-A-R MODEL nor children of a nestedgrid
+@audit_check("Unmapped Attributes")
+def unmapped_attributes(frames):
+    df_attributes = frames["ATTRIBUTES"]
+    names = df_attributes["NAME"][~df_attributes["GROUP"].isin(_nested_parents(frames))]
+    return _sorted_difference(names, frames["E-A-R MODEL"]["MAPPED ATTRIBUTE"])
+
+
+# Nestedgrid parents none of whose children is marked as the identifier
+@audit_check("Nestedgrid Attributes Without Identifier")
+def nestedgrid_without_identifier(frames):
+    df_attributes = frames["ATTRIBUTES"]
+    is_identifier = df_attributes["IS NESTED GROUP IDENTIFIER?"].str.lower() == "yes"
+    identified = is_identifier.groupby(df_attributes["GROUP"], observed=True).any()
+    identified_groups = pd.Index(identified.index[identified.to_numpy()], dtype=object)
+    return sorted(_nested_parents(frames).difference(identified_groups, sort=False))
+
+
+# Findings of the given checks (default: all registered), as title -> names
+def run_audit(file, checks=None):
+    stages = StageTimer()
+    frames = load_audit_frames(file)
+    stages.done("read sheets", rows=sum(len(df) for df in frames.values()))
+    results = {title: AUDIT_CHECKS[title](frames) for title in (AUDIT_CHECKS if checks is None else checks)}
+    stages.done("audit checks", rows=sum(len(names) for names in results.values()))
+    return results
+
+
+# Findings as one row per flagged name
+def audit_frame(results):
+    return pd.DataFrame([(title, name) for title, names in results.items() for name in names], columns=["CHECK", "NAME"])
+
+
+def audit_text(results):
+    return "\n\n".join(f"{title}:\n" + "\n".join(f"- {name}" for name in names) for title, names in results.items())
@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import openpyxl
+import pandas as pd
+
+import synthetic
+from lineage import (
+    generate_auth_lineage, generate_data_model_audit, generate_data_model_lineage, generate_governance_lineage,
+    generate_keyword_analysis, generate_unused_business_rules
+)
+from workbook import ParsedWorkbook
+
+DEFAULT_SIZES = [100, 1000, 5000]
+DEFAULT_BASELINES = "benchmark_baselines.json"
+
+# Synthetic workbook for one model kind, scaled by a single size knob
+MODELS = {
+    "governance": lambda size: synthetic.governance_model(n_rules=size),
+    "authorization": lambda size: synthetic.authorization_model(n_policies=size, n_permission_sets=max(1, size // 5)),
+    "data_model": lambda size: synthetic.data_model(
+        n_attributes=size * 5, n_entities=max(1, size // 5), n_relationships=max(1, size // 10)
+    ),
+}
+
+# Generator name -> (model kind, generator)
+BENCHMARKS = {
+    "generate_governance_lineage": ("governance", generate_governance_lineage),
+    "generate_keyword_analysis": ("governance", generate_keyword_analysis),
+    "generate_unused_business_rules": ("governance", generate_unused_business_rules),
+    "generate_auth_lineage": ("authorization", generate_auth_lineage),
+    "generate_data_model_lineage": ("data_model", generate_data_model_lineage),
+    "generate_data_model_audit": ("data_model", generate_data_model_audit),
+}
+
+
+# Time one cold run (parsing included) and, optionally, a second run under
+# tracemalloc for the peak of memory allocated by Python
+def measure(generate, data, repeat=1, memory=True):
+    seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        generate(ParsedWorkbook(data))
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    result = {"seconds": round(seconds, 4)}
+    if memory:
+        tracemalloc.start()
+        try:
+            generate(ParsedWorkbook(data))
+            result["peak_mib"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+# Setup the baselines were recorded on. Seconds are only comparable on the
+# same setup; peak memory and scaling ratios are compared on any machine.
+def current_setup():
+    return {
+        "python": platform.python_version(), "pandas": pd.__version__, "openpyxl": openpyxl.__version__,
+        "machine": platform.machine(), "cpus": os.cpu_count()
+    }
+
+
+# Every generator at every size. Sizes after the smallest also get "scaling":
+# their time over the time at the smallest size, which doesn't depend on how
+# fast the machine is.
+def run_benchmarks(names, sizes, repeat=1, memory=True):
+    results = {}
+    sizes = sorted(sizes)
+    for size in sizes:
+        models = {}
+        for name in names:
+            kind, generate = BENCHMARKS[name]
+            if kind not in models:
+                models[kind] = MODELS[kind](size)
+            key = f"{name}@{size}"
+            results[key] = measure(generate, models[kind], repeat, memory)
+            if size != sizes[0]:
+                results[key]["scaling"] = round(results[key]["seconds"] / results[f"{name}@{sizes[0]}"]["seconds"], 2)
+                results[key]["scaling_from"] = sizes[0]
+            print(f"{key:<45} {results[key]['seconds']:>9.3f}s" +
+                  (f" {results[key]['peak_mib']:>9.1f} MiB" if memory else ""), flush=True)
+    return results
+
+
+# Entries that are slower, scale worse or use more memory than
+# baseline * (1 + tolerance). Seconds are skipped unless same_setup, and a
+# slowdown also has to exceed min_seconds, since sub-second runs are mostly
+# noise.
+def find_regressions(results, baselines, tolerance, same_setup=True, min_seconds=0.0):
+    metrics = ("seconds", "scaling", "peak_mib") if same_setup else ("scaling", "peak_mib")
+    regressions = []
+    for key, result in results.items():
+        baseline = baselines.get(key)
+        if baseline is None:
+            continue
+        for metric in metrics:
+            if metric not in result or metric not in baseline:
+                continue
+            if metric == "scaling" and result["scaling_from"] != baseline.get("scaling_from"):
+                continue
+            if metric == "seconds" and result[metric] - baseline[metric] <= min_seconds:
+                continue
+            if result[metric] > baseline[metric] * (1 + tolerance):
+                regressions.append(f"{key} {metric}: {result[metric]} > baseline {baseline[metric]}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every report generator on synthetic workbooks.")
+    parser.add_argument("-s", "--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="Model sizes to run")
+    parser.add_argument("-b", "--benchmarks", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help="Generators to benchmark (default: all)")
+    parser.add_argument("-n", "--repeat", type=int, default=1, help="Timed runs per case; the fastest is kept")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak-memory run")
+    parser.add_argument("--baselines", default=DEFAULT_BASELINES, help="JSON file of stored baselines")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baselines")
+    parser.add_argument("--min-seconds", type=float, default=0.5,
+                        help="Smallest slowdown in seconds that counts as a regression (default: 0.5)")
+    parser.add_argument("--allow-missing-baselines", action="store_true",
+                        help="Don't fail when a benchmark has no stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown or memory growth over the baseline (default: 0.25 = 25%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run_benchmarks(args.benchmarks, args.sizes, args.repeat, not args.no_memory)
+
+    stored = {"setup": None, "results": {}}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as fh:
+            stored = json.load(fh)
+    setup = current_setup()
+    same_setup = stored["setup"] == setup
+
+    if args.save_baseline:
+        # Results from another setup can't be mixed with these timings
+        baselines = stored["results"] if same_setup else {}
+        baselines.update(results)
+        with open(args.baselines, "w") as fh:
+            json.dump({"setup": setup, "results": baselines}, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+        print(f"Saved {len(results)} baseline(s) to {args.baselines}")
+        return 0
+
+    missing = [key for key in results if key not in stored["results"]]
+    if missing:
+        print(f"No baselines in {args.baselines} for: {', '.join(missing)}", file=sys.stderr)
+        if not args.allow_missing_baselines:
+            print("Record them with --save-baseline, or pass --allow-missing-baselines", file=sys.stderr)
+            return 1
+    if not same_setup:
+        print(f"Baselines were recorded on {stored['setup']}, not {setup}; "
+              "comparing scaling and peak memory only", file=sys.stderr)
+
+    regressions = find_regressions(results, stored["results"], args.tolerance, same_setup, args.min_seconds)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from instrumentation import instrumented_run
+from lineage import (
+    generate_auth_lineage, generate_data_model_audit, generate_data_model_lineage, generate_governance_lineage,
+    generate_keyword_analysis, generate_unused_business_rules
+)
+from workbook import get_workbook
+from writers import OUTPUT_FORMATS
+
+MODEL_EXTENSIONS = (".xlsm", ".xlsx")
+
+# Report name -> (sheet that marks the model type, generator, output file name)
+REPORTS = {
+    "governance_lineage": (
+        "BUSINESS RULES", lambda model, fmt: generate_governance_lineage(model, fmt), "Goverance_rules_lineage_output.{fmt}"
+    ),
+    "keyword_analysis": (
+        "BUSINESS RULES", lambda model, fmt: generate_keyword_analysis(model, fmt=fmt), "keywords used in governance model.{fmt}"
+    ),
+    "unused_business_rules": (
+        "BUSINESS RULES", lambda model, fmt: generate_unused_business_rules(model, fmt), "unused_business_rules.{fmt}"
+    ),
+    "auth_lineage": (
+        "POLICY", lambda model, fmt: generate_auth_lineage(model, fmt), "dynamic_auth_lineage_output.{fmt}"
+    ),
+    "data_model_lineage": (
+        "E-A-R MODEL", lambda model, fmt: generate_data_model_lineage(model, fmt), "Datamodel_lineage_document.{fmt}"
+    ),
+    "data_model_audit": (
+        "E-A-R MODEL", lambda model, fmt: generate_data_model_audit(model), "Datamodel_audit_report.txt"
+    ),
+    "data_model_audit_findings": (
+        "E-A-R MODEL", lambda model, fmt: generate_data_model_audit(model, fmt), "Datamodel_audit_findings.{fmt}"
+    ),
+}
+
+
+# Expand directories and glob patterns into a sorted list of model workbooks
+def find_model_files(inputs):
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = glob.glob(os.path.join(item, "*"))
+        else:
+            candidates = glob.glob(item, recursive=True)
+        paths.update(
+            path for path in candidates
+            if os.path.isfile(path) and path.lower().endswith(MODEL_EXTENSIONS)
+            and not os.path.basename(path).startswith("~$")
+        )
+    return sorted(paths)
+
+
+# Output directory per workbook: its path relative to the folder all inputs
+# share, without the extension, so models with the same file name in
+# different folders don't overwrite each other. Workbooks that only differ by
+# extension (x.xlsm next to x.xlsx) keep it as a suffix (x_xlsm, x_xlsx).
+def output_dirs(paths, output_dir):
+    full_paths = [os.path.abspath(path) for path in paths]
+    root = os.path.commonpath([os.path.dirname(path) for path in full_paths])
+    stems = [os.path.splitext(os.path.relpath(path, root))[0] for path in full_paths]
+    counts = Counter(os.path.normcase(stem).lower() for stem in stems)
+    targets = {}
+    for path, stem in zip(paths, stems):
+        if counts[os.path.normcase(stem).lower()] > 1:
+            stem += "_" + os.path.splitext(path)[1].lstrip(".").lower()
+        targets[path] = os.path.join(output_dir, stem)
+    return targets
+
+
+# Run every requested report that applies to one workbook and write the outputs
+# to target_dir. Returns one timing row per step. With diagnostics, per-stage
+# measurements (and cProfile output when profiling) are written next to the
+# reports.
+def process_file(path, target_dir, report_names, fmt, diagnostics=False, profile=False):
+    timings = []
+    runs = []
+
+    start = time.perf_counter()
+    try:
+        model = get_workbook(path)
+        sheets = set(model.sheet_names())
+    except Exception as exc:
+        return [{"FILE": path, "REPORT": "load", "SECONDS": time.perf_counter() - start, "STATUS": f"error: {exc}"}]
+    timings.append({"FILE": path, "REPORT": "load", "SECONDS": time.perf_counter() - start, "STATUS": "ok"})
+
+    for report_name in report_names:
+        marker_sheet, generate, file_name = REPORTS[report_name]
+        if marker_sheet not in sheets:
+            continue
+        start = time.perf_counter()
+        try:
+            with instrumented_run(report_name, profile=profile, trace_memory=diagnostics) as run:
+                output = generate(model, fmt)
+            runs.append(run)
+            os.makedirs(target_dir, exist_ok=True)
+            with open(os.path.join(target_dir, file_name.format(fmt=fmt)), "wb") as fh:
+                fh.write(output.getvalue())
+            status = "ok"
+        except Exception as exc:
+            status = f"error: {exc}"
+        timings.append({"FILE": path, "REPORT": report_name, "SECONDS": time.perf_counter() - start, "STATUS": status})
+
+    if (diagnostics or profile) and runs:
+        os.makedirs(target_dir, exist_ok=True)
+        with open(os.path.join(target_dir, "diagnostics.json"), "w") as fh:
+            json.dump([run.to_dict() for run in runs], fh, indent=2)
+        for run in runs:
+            if run.profile_text:
+                with open(os.path.join(target_dir, f"{run.report}.profile.txt"), "w") as fh:
+                    fh.write(run.profile_text)
+    return timings
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate lineage and audit reports for many model workbooks.")
+    parser.add_argument("inputs", nargs="+", help="Workbook files, directories or glob patterns")
+    parser.add_argument("-o", "--output-dir", default="lineage_output", help="Directory to write reports to")
+    parser.add_argument("-r", "--reports", nargs="+", choices=list(REPORTS), default=list(REPORTS),
+                        help="Reports to generate (default: all that apply to each workbook)")
+    parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS, default="xlsx", help="Format of tabular reports")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument("--diagnostics", action="store_true",
+                        help="Write per-stage time, peak memory and row counts to diagnostics.json per workbook")
+    parser.add_argument("--profile", action="store_true", help="Run each report under cProfile and save the stats")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    paths = find_model_files(args.inputs)
+    if not paths:
+        print("No .xlsm/.xlsx workbooks found", file=sys.stderr)
+        return 1
+    targets = output_dirs(paths, args.output_dir)
+    by_target = defaultdict(list)
+    for path, target_dir in targets.items():
+        by_target[os.path.normcase(target_dir).lower()].append(path)
+    clashes = [clash for clash in by_target.values() if len(clash) > 1]
+    if clashes:
+        for clash in clashes:
+            print(f"Workbooks would share an output directory: {', '.join(clash)}", file=sys.stderr)
+        return 1
+
+    timings = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(paths)))) as pool:
+        futures = {
+            pool.submit(process_file, path, target_dir, args.reports, args.format, args.diagnostics, args.profile): path
+            for path, target_dir in targets.items()
+        }
+        for future in as_completed(futures):
+            rows = future.result()
+            timings.extend(rows)
+            total = sum(row["SECONDS"] for row in rows)
+            failed = [row["REPORT"] for row in rows if row["STATUS"] != "ok"]
+            print(f"{futures[future]}: {total:.2f}s" + (f" (failed: {', '.join(failed)})" if failed else ""))
+
+    df_timings = pd.DataFrame(timings, columns=["FILE", "REPORT", "SECONDS", "STATUS"])
+    df_timings = df_timings.sort_values(by=["FILE", "REPORT"])
+    os.makedirs(args.output_dir, exist_ok=True)
+    summary_path = os.path.join(args.output_dir, "timing_summary.csv")
+    df_timings.to_csv(summary_path, index=False)
+    print(f"Processed {len(paths)} workbook(s) in {time.perf_counter() - start:.2f}s; timings in {summary_path}")
+    return 1 if (df_timings["STATUS"] != "ok").any() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
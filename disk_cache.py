@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+# The on-disk cache stores sheets as Arrow IPC files and is only enabled when
+# the optional pyarrow package is installed
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "lineage-generator")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+FORMAT_VERSION = 3
+NAN = float("nan")
+
+
+def _write_atomic(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            write(fh)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+# Parsed workbook sheets persisted across sessions and restarts, keyed by the
+# workbook's content hash:
+#
+#   <directory>/<content hash>.v<FORMAT_VERSION>/meta.json       sheet names and header rows
+#   <directory>/<content hash>.v<FORMAT_VERSION>/<sheet>.arrow   parsed columns of one sheet
+#
+# FORMAT_VERSION is bumped whenever parsing changes what a sheet reads as, so
+# entries written by an older version are never loaded (and are evicted in
+# time).
+# Sheets are memory-mapped on load. Whole workbooks are evicted least recently
+# used first once the directory grows past max_bytes. Columns Arrow cannot
+# represent (e.g. numbers and text mixed in one column) are not persisted and
+# are simply parsed again from the workbook.
+class SheetDiskCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        if pa is None:
+            raise RuntimeError("The on-disk sheet cache requires the optional pyarrow package")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _workbook_dir(self, key):
+        return os.path.join(self.directory, f"{key}.v{FORMAT_VERSION}")
+
+    def _sheet_path(self, key, sheet):
+        return os.path.join(self._workbook_dir(key), hashlib.sha1(sheet.encode("utf-8")).hexdigest() + ".arrow")
+
+    # Mark a workbook as recently used
+    def touch(self, key):
+        try:
+            os.utime(self._workbook_dir(key))
+        except OSError:
+            pass
+
+    def load_meta(self, key):
+        try:
+            with open(os.path.join(self._workbook_dir(key), "meta.json")) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def store_meta(self, key, meta):
+        try:
+            payload = json.dumps(meta).encode("utf-8")
+        except (TypeError, ValueError):
+            return
+        os.makedirs(self._workbook_dir(key), exist_ok=True)
+        _write_atomic(os.path.join(self._workbook_dir(key), "meta.json"), lambda fh: fh.write(payload))
+        self.evict()
+
+    def _read_table(self, key, sheet):
+        try:
+            # The table's buffers point into the map, which stays open while they are in use
+            return pa.ipc.open_file(pa.memory_map(self._sheet_path(key, sheet))).read_all()
+        except (OSError, pa.ArrowException):
+            return None
+
+    # Cached columns of a sheet, as Series; columns not on disk are left out
+    def load_columns(self, key, sheet, columns):
+        table = self._read_table(key, sheet)
+        if table is None:
+            return {}
+        found = [col for col in columns if isinstance(col, str) and col in table.column_names]
+        if not found:
+            return {}
+        df = table.select(found).to_pandas()
+        loaded = {}
+        for col in found:
+            series = df[col]
+            if series.dtype == object:
+                series = series.where(series.notna(), NAN)
+            loaded[col] = series
+        return loaded
+
+    # Merge parsed columns of a sheet into its file on disk
+    def store_columns(self, key, sheet, columns):
+        arrays = {}
+        for col, series in columns.items():
+            if not isinstance(col, str):
+                continue
+            try:
+                arrays[col] = pa.array(series, from_pandas=True)
+            except (pa.ArrowException, TypeError, ValueError):
+                continue
+        if not arrays:
+            return
+
+        with self._lock:
+            existing = self._read_table(key, sheet)
+            if existing is not None and existing.num_rows == len(next(iter(arrays.values()))):
+                for col in existing.column_names:
+                    arrays.setdefault(col, existing.column(col))
+            table = pa.table(arrays)
+
+            os.makedirs(self._workbook_dir(key), exist_ok=True)
+
+            def write(fh):
+                with pa.ipc.new_file(fh, table.schema) as writer:
+                    writer.write_table(table)
+
+            _write_atomic(self._sheet_path(key, sheet), write)
+        self.evict()
+
+    # Drop least recently used workbooks until the cache fits in max_bytes
+    def evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if not os.path.isdir(path):
+                    continue
+                try:
+                    size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+                    entries.append((os.stat(path).st_mtime, size, path))
+                except OSError:
+                    continue
+                total += size
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory, exist_ok=True)
+
+
+# Cache configured from LINEAGE_CACHE_DIR / LINEAGE_CACHE_MAX_BYTES; None when
+# pyarrow is missing or LINEAGE_CACHE_DIR is set to an empty string
+def default_disk_cache():
+    directory = os.environ.get("LINEAGE_CACHE_DIR", DEFAULT_CACHE_DIR)
+    if pa is None or not directory:
+        return None
+    max_bytes = int(os.environ.get("LINEAGE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+    try:
+        return SheetDiskCache(directory, max_bytes)
+    except OSError:
+        return None
@@ -0,0 +1,416 @@
+import threading
+from collections import defaultdict, deque
+
+import pandas as pd
+
+from instrumentation import StageTimer
+from matcher import SubstringMatcher
+from workbook import get_workbook
+
+# Node kinds. Nodes are (kind, key) tuples. Sheet rows (ROW_KINDS) are keyed
+# by their Excel row number, so rows sharing a name stay separate nodes and
+# are looked up by name through LineageGraph.named; everything else is keyed
+# by name.
+RULE = "rule"
+CONDITION = "condition"
+MAPPING = "governance mapping"
+CONTEXT = "context"
+ENTITY = "entity"
+POLICY = "policy"
+POLICY_MAPPING = "policy mapping"
+ROLE = "role"
+PERMISSION_SET = "permission set"
+PERMISSION = "permission"
+ATTRIBUTE = "attribute"
+RELATIONSHIP = "relationship"
+ATTRIBUTE_DEFINITION = "attribute definition"
+
+ROW_KINDS = {RULE, CONDITION, MAPPING, POLICY, POLICY_MAPPING, PERMISSION, ATTRIBUTE_DEFINITION}
+
+# Context keys are "<name>Context" or "<name><n>Context" for n in 1..15
+MAX_CONTEXT_SUFFIX = 16
+
+# Sheets each section of the graph is built from
+SECTION_SHEETS = {
+    "governance": ["BUSINESS RULES", "BUSINESS CONDITIONS", "GOVERNANCE MAPPING", "CONTEXTS"],
+    "authorization": ["POLICY", "POLICY MAPPING", "POLICY PERMISSIONS"],
+    "data model": ["ATTRIBUTES", "E-A-R MODEL"],
+}
+
+
+# Names a FOR CONTEXT key can belong to, parsed once per mapping row
+def context_key_owners(key):
+    if not isinstance(key, str) or not key.endswith("Context"):
+        return []
+    stem = key[:-len("Context")]
+    owners = [stem]
+    for i in range(1, MAX_CONTEXT_SUFFIX):
+        suffix = str(i)
+        if stem.endswith(suffix):
+            owners.append(stem[:-len(suffix)])
+    return owners
+
+
+# Split a "a || b" list cell into its stripped, non-empty names
+def split_names(value):
+    if not isinstance(value, str):
+        return []
+    return [name.strip() for name in value.split("||") if name.strip()]
+
+
+# Excel row number of a sheet row, given its position in the parsed frame
+def _excel_row(index):
+    return int(index) + 2
+
+
+# Typed lineage graph of one model. Every edge is indexed in both directions,
+# so successors and predecessors are dict lookups. Row nodes keep the sheet row
+# they were built from as their attributes. Edges of a node keep sheet row
+# order.
+class LineageGraph:
+    def __init__(self):
+        self.nodes = {}
+        self._by_kind = defaultdict(list)
+        self._names = {}
+        self._named = defaultdict(list)
+        self._out = defaultdict(list)
+        self._in = defaultdict(list)
+        self._sections = set()
+        self._lock = threading.Lock()
+
+    # Add (kind, key) once. name is what row nodes are looked up by in named();
+    # rows without a name are looked up by their key (Excel row)
+    def add_node(self, kind, key, attrs=None, name=None):
+        node = (kind, key)
+        if node not in self.nodes:
+            self.nodes[node] = attrs or {}
+            self._by_kind[kind].append(node)
+            if name is not None or kind not in ROW_KINDS:
+                self._names[node] = key if name is None else name
+            self._named[(kind, self.name_of(node))].append(node)
+        return node
+
+    def add_edge(self, source, relation, target):
+        self._out[source].append((relation, target))
+        self._in[target].append((relation, source))
+
+    def has_node(self, kind, name):
+        return (kind, name) in self.nodes
+
+    def attrs(self, node):
+        return self.nodes[node]
+
+    # Nodes of a kind with the given name, in sheet row order
+    def named(self, kind, name):
+        return list(self._named.get((kind, name), ()))
+
+    def name_of(self, node):
+        return self._names.get(node, node[1])
+
+    # Distinct names of a kind's nodes
+    def names(self, kind):
+        return list(dict.fromkeys(
+            self.name_of(node) for node in self._by_kind.get(kind, ()) if not pd.isna(self.name_of(node))
+        ))
+
+    # Display name of a node; rows without a name show their Excel row
+    def label(self, node):
+        return self._names[node] if node in self._names else f"row {node[1]}"
+
+    def nodes_of(self, kind):
+        return list(self._by_kind.get(kind, ()))
+
+    def kinds(self):
+        return [kind for kind, nodes in self._by_kind.items() if nodes]
+
+    def out_edges(self, node):
+        return list(self._out.get(node, ()))
+
+    def in_edges(self, node):
+        return list(self._in.get(node, ()))
+
+    def successors(self, node, relation=None):
+        return [target for rel, target in self._out.get(node, ()) if relation is None or rel == relation]
+
+    def predecessors(self, node, relation=None):
+        return [source for rel, source in self._in.get(node, ()) if relation is None or rel == relation]
+
+    # Every node reachable from node, following edges forwards (or backwards
+    # with reverse=True), optionally only through the given relations
+    def reachable(self, node, relations=None, reverse=False):
+        edges = self._in if reverse else self._out
+        seen = {node}
+        queue = deque([node])
+        while queue:
+            for relation, other in edges.get(queue.popleft(), ()):
+                if other not in seen and (relations is None or relation in relations):
+                    seen.add(other)
+                    queue.append(other)
+        seen.discard(node)
+        return seen
+
+    # Build the named sections (see SECTION_SHEETS) from model, each once
+    def ensure(self, model, sections):
+        with self._lock:
+            for section in sections:
+                if section not in self._sections:
+                    SECTION_BUILDERS[section](self, model)
+                    self._sections.add(section)
+        return self
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+# Governance: rule -> condition -> governance mapping -> context / entity.
+# Conditions link to the rules named (as substrings) in MAPPED BUSINESS
+# RULE(s); mappings link to the conditions and rules their FOR CONTEXT key
+# belongs to ("context mapping") and to the rule named in MAPPED BUSINESS
+# RULE ("mapped rule"). Conditions also point at the roles, attributes and
+# relationships they impact.
+def add_governance(graph, model):
+    stages = StageTimer()
+    df_rules = model.sheet("BUSINESS RULES", ["NAME", "TYPE", "DEFINITION", "DISPLAY NAME", "IS ENABLED?"])
+    df_conditions = model.sheet("BUSINESS CONDITIONS", [
+        "NAME", "MAPPED BUSINESS RULE(s)", "IMPACTED ROLES", "IMPACTED ATTRIBUTES",
+        "IMPACTED RELATIONSHIPS", "DISPLAY NAME", "IS ENABLED?"
+    ])
+    df_mapping = model.sheet("GOVERNANCE MAPPING", [
+        "ENTITY", "MAPPED BUSINESS RULE", "MAPPED BUSINESS CONDITION", "FOR CONTEXT", "IS ENABLED?"
+    ])
+
+    # --- FIX: Handle duplicate "CONTEXT TYPE || CONTEXT NAME" columns ---
+    # The reader gives duplicate column names unique suffixes (.1, .2, etc.)
+    # Select the SECOND occurrence (Column D)
+    context_cols = model.columns("CONTEXTS")
+    context_type_name_col = [col for col in context_cols if str(col).startswith("CONTEXT TYPE || CONTEXT NAME")][1]
+
+    df_contexts = model.sheet("CONTEXTS", [
+        "NAME", context_type_name_col,
+        "WORKFLOW ACTIVITY", "WORKFLOW ACTIVITY ACTION(s)", "WORKFLOW ACTIVITY CRITERIA"
+    ])
+    df_contexts = df_contexts.rename(columns={
+        "NAME": "CONTEXT NAME",
+        context_type_name_col: "CONTEXT TYPE AND NAME"
+    })
+    # --- END FIX ---
+    stages.done("read governance sheets", rows=len(df_rules) + len(df_conditions) + len(df_mapping) + len(df_contexts))
+
+    df_rules = df_rules.rename(columns={"NAME": "RULE NAME", "DISPLAY NAME": "RULE DISPLAY NAME"})
+    df_rules = df_rules[df_rules["IS ENABLED?"] == "Yes"][["RULE NAME", "TYPE", "DEFINITION", "RULE DISPLAY NAME"]]
+
+    df_conditions = df_conditions.rename(columns={"NAME": "CONDITION NAME", "DISPLAY NAME": "CONDITION DISPLAY NAME"})
+    df_conditions = df_conditions[df_conditions["IS ENABLED?"] == "Yes"][[
+        "CONDITION NAME", "MAPPED BUSINESS RULE(s)", "IMPACTED ROLES", "IMPACTED ATTRIBUTES",
+        "IMPACTED RELATIONSHIPS", "CONDITION DISPLAY NAME"
+    ]]
+
+    df_mapping = df_mapping.assign(**{"FOR CONTEXT": df_mapping["FOR CONTEXT"].astype(str)})
+    df_mapping = df_mapping[df_mapping["IS ENABLED?"] == "Yes"][[
+        "ENTITY", "MAPPED BUSINESS RULE", "MAPPED BUSINESS CONDITION", "FOR CONTEXT"
+    ]]
+
+    # CONTEXT NAME -> first context row with that name
+    for ctx in df_contexts.to_dict("records"):
+        if not pd.isna(ctx["CONTEXT NAME"]):
+            graph.add_node(CONTEXT, ctx["CONTEXT NAME"], ctx)
+
+    # FOR CONTEXT owners are compared as text
+    rules_by_owner = defaultdict(list)
+    rules = df_rules.to_dict("records")
+    for index, rule in zip(df_rules.index, rules):
+        rule_node = graph.add_node(RULE, _excel_row(index), rule, rule["RULE NAME"])
+        rules_by_owner[f"{rule['RULE NAME']}"].append(rule_node)
+
+    matcher = SubstringMatcher(rule["RULE NAME"] for rule in rules)
+    conditions_by_owner = defaultdict(list)
+    for index, cond in zip(df_conditions.index, df_conditions.to_dict("records")):
+        cond_node = graph.add_node(CONDITION, _excel_row(index), cond, cond["CONDITION NAME"])
+        conditions_by_owner[f"{cond['CONDITION NAME']}"].append(cond_node)
+        if isinstance(cond["MAPPED BUSINESS RULE(s)"], str):
+            for rule_name in matcher.find(cond["MAPPED BUSINESS RULE(s)"]):
+                for rule_node in graph.named(RULE, rule_name):
+                    graph.add_edge(rule_node, "condition", cond_node)
+        for kind, column in ((ROLE, "IMPACTED ROLES"), (ATTRIBUTE, "IMPACTED ATTRIBUTES"),
+                             (RELATIONSHIP, "IMPACTED RELATIONSHIPS")):
+            for name in split_names(cond[column]):
+                graph.add_edge(cond_node, "impacts", graph.add_node(kind, name))
+
+    for index, map_row in zip(df_mapping.index, df_mapping.to_dict("records")):
+        map_node = graph.add_node(MAPPING, _excel_row(index), map_row)
+        for owner in context_key_owners(map_row["FOR CONTEXT"]):
+            for cond_node in conditions_by_owner.get(owner, ()):
+                graph.add_edge(cond_node, "context mapping", map_node)
+            for rule_node in rules_by_owner.get(owner, ()):
+                graph.add_edge(rule_node, "context mapping", map_node)
+        if not pd.isna(map_row["MAPPED BUSINESS RULE"]):
+            for rule_node in graph.named(RULE, map_row["MAPPED BUSINESS RULE"]):
+                graph.add_edge(rule_node, "mapped rule", map_node)
+        if graph.has_node(CONTEXT, map_row["FOR CONTEXT"]):
+            graph.add_edge(map_node, "context", (CONTEXT, map_row["FOR CONTEXT"]))
+        if not pd.isna(map_row["ENTITY"]):
+            graph.add_edge(map_node, "entity", graph.add_node(ENTITY, map_row["ENTITY"]))
+    stages.done("index governance graph", rows=len(graph))
+
+
+# Authorization: policy -> policy mapping -> role / permission set ->
+# permission -> attribute / relationship. Policy names are matched as literal
+# substrings of the mapping's POLICY and mapped permission sets as literal
+# substrings of PERMISSION SET. Policies also point at their ENTITY TYPE.
+def add_authorization(graph, model):
+    stages = StageTimer()
+    df_policy = model.sheet("POLICY", ["POLICY", "ENTITY TYPE", "CONDITION", "ENABLED"])
+    df_mapping = model.sheet("POLICY MAPPING", ["POLICY", "ROLE", "PERMISSION SET"])
+    df_permissions = model.sheet("POLICY PERMISSIONS", ["PERMISSION SET", "ATTRIBUTE", "RELATIONSHIP", "PERMISSION"])
+    stages.done("read authorization sheets", rows=len(df_policy) + len(df_mapping) + len(df_permissions))
+
+    df_policy = df_policy[df_policy["ENABLED"] == "Yes"][["POLICY", "ENTITY TYPE", "CONDITION"]]
+    df_mapping = df_mapping.rename(columns={"POLICY": "MAPPING POLICY", "PERMISSION SET": "MAPPING PERMISSION SET"})
+
+    policies = df_policy.to_dict("records")
+    for index, policy in zip(df_policy.index, policies):
+        policy_node = graph.add_node(POLICY, _excel_row(index), policy, policy["POLICY"])
+        if not pd.isna(policy["ENTITY TYPE"]):
+            graph.add_edge(policy_node, "entity type", graph.add_node(ENTITY, policy["ENTITY TYPE"]))
+
+    policy_matcher = SubstringMatcher(policy["POLICY"] for policy in policies)
+    set_names = []
+    for index, map_row in zip(df_mapping.index, df_mapping.to_dict("records")):
+        map_node = graph.add_node(POLICY_MAPPING, _excel_row(index), map_row)
+        if isinstance(map_row["MAPPING POLICY"], str):
+            for policy_name in policy_matcher.find(map_row["MAPPING POLICY"]):
+                for policy_node in graph.named(POLICY, policy_name):
+                    graph.add_edge(policy_node, "mapping", map_node)
+        if not pd.isna(map_row["ROLE"]):
+            graph.add_edge(map_node, "role", graph.add_node(ROLE, map_row["ROLE"]))
+        if isinstance(map_row["MAPPING PERMISSION SET"], str):
+            graph.add_edge(map_node, "permission set", graph.add_node(PERMISSION_SET, map_row["MAPPING PERMISSION SET"]))
+            set_names.append(map_row["MAPPING PERMISSION SET"])
+
+    set_matcher = SubstringMatcher(set_names)
+    for index, perm_row in zip(df_permissions.index, df_permissions.to_dict("records")):
+        perm_node = graph.add_node(PERMISSION, _excel_row(index), perm_row)
+        if isinstance(perm_row["PERMISSION SET"], str):
+            for perm_set in set_matcher.find(perm_row["PERMISSION SET"]):
+                graph.add_edge((PERMISSION_SET, perm_set), "permission", perm_node)
+        if not pd.isna(perm_row["ATTRIBUTE"]):
+            graph.add_edge(perm_node, "attribute", graph.add_node(ATTRIBUTE, perm_row["ATTRIBUTE"]))
+        if not pd.isna(perm_row["RELATIONSHIP"]):
+            graph.add_edge(perm_node, "relationship", graph.add_node(RELATIONSHIP, perm_row["RELATIONSHIP"]))
+    stages.done("index authorization graph", rows=len(graph))
+
+
+# Data model: attribute definition (ATTRIBUTES row) -> attribute -> entity and
+# relationship -> entity from the E-A-R MODEL rows that name an entity
+def add_data_model(graph, model):
+    stages = StageTimer()
+    df_attr = model.sheet("ATTRIBUTES", ["NAME", "DISPLAY NAME", "DATA TYPE", "USES REFERENCE DATA", "PATH ROOT NODE"])
+    df_ear = model.sheet("E-A-R MODEL", ["MAPPED ATTRIBUTE", "ENTITY", "MAPPED RELATIONSHIP"])
+    stages.done("read data model sheets", rows=len(df_attr) + len(df_ear))
+
+    for index, attr in zip(df_attr.index, df_attr.to_dict("records")):
+        if not pd.isna(attr["NAME"]):
+            definition = graph.add_node(ATTRIBUTE_DEFINITION, _excel_row(index), attr, attr["NAME"])
+            graph.add_edge(definition, "defines", graph.add_node(ATTRIBUTE, attr["NAME"]))
+
+    df_ear = df_ear[df_ear["ENTITY"].notna() & (df_ear["ENTITY"].astype(str).str.strip() != "")]
+    for ear in df_ear.to_dict("records"):
+        entity_node = graph.add_node(ENTITY, ear["ENTITY"])
+        if not pd.isna(ear["MAPPED ATTRIBUTE"]):
+            graph.add_edge(graph.add_node(ATTRIBUTE, ear["MAPPED ATTRIBUTE"]), "entity", entity_node)
+        if not pd.isna(ear["MAPPED RELATIONSHIP"]):
+            graph.add_edge(graph.add_node(RELATIONSHIP, ear["MAPPED RELATIONSHIP"]), "entity", entity_node)
+    stages.done("index data model graph", rows=len(graph))
+
+
+SECTION_BUILDERS = {
+    "governance": add_governance,
+    "authorization": add_authorization,
+    "data model": add_data_model,
+}
+
+
+# Sections whose sheets are all present in the workbook
+def available_sections(file):
+    sheets = set(get_workbook(file).sheet_names())
+    return [section for section, names in SECTION_SHEETS.items() if sheets.issuperset(names)]
+
+
+# The lineage graph of an upload, built once and shared by every report and
+# query on it. Sections are added on first use; by default every section the
+# workbook has sheets for.
+def get_lineage_graph(file, sections=None):
+    model = get_workbook(file)
+    graph = model.cached(("lineage_graph",), LineageGraph)
+    return graph.ensure(model, available_sections(model) if sections is None else sections)
+
+
+# -------------------------------
+# Queries
+# -------------------------------
+# Conditions impacting an attribute (IMPACTED ATTRIBUTES) and the rules they
+# belong to, plus the entities the attribute is mapped to
+def impact_on_attribute(graph, attribute):
+    rows = []
+    node = (ATTRIBUTE, attribute)
+    for cond_node in graph.predecessors(node, "impacts"):
+        rules = graph.predecessors(cond_node, "condition") or [None]
+        for rule_node in rules:
+            rows.append({
+                "ATTRIBUTE": attribute, "RULE NAME": graph.label(rule_node) if rule_node else "",
+                "CONDITION NAME": graph.label(cond_node), "ENTITY": ""
+            })
+    for entity_node in graph.successors(node, "entity"):
+        rows.append({"ATTRIBUTE": attribute, "RULE NAME": "", "CONDITION NAME": "", "ENTITY": graph.label(entity_node)})
+    return pd.DataFrame(rows, columns=["ATTRIBUTE", "RULE NAME", "CONDITION NAME", "ENTITY"])
+
+
+# Role -> permission rows granted by the enabled policies on an entity type
+def permissions_on_entity_type(graph, entity_type):
+    rows = []
+    for policy_node in graph.predecessors((ENTITY, entity_type), "entity type"):
+        for map_node in graph.successors(policy_node, "mapping"):
+            role = graph.attrs(map_node)["ROLE"]
+            for set_node in graph.successors(map_node, "permission set"):
+                for perm_node in graph.successors(set_node, "permission"):
+                    perm = graph.attrs(perm_node)
+                    rows.append({
+                        "ENTITY TYPE": entity_type, "POLICY": graph.label(policy_node), "ROLE": role,
+                        "PERMISSION SET": graph.label(set_node), "ATTRIBUTE": perm["ATTRIBUTE"],
+                        "RELATIONSHIP": perm["RELATIONSHIP"], "PERMISSION": perm["PERMISSION"]
+                    })
+    return pd.DataFrame(rows, columns=[
+        "ENTITY TYPE", "POLICY", "ROLE", "PERMISSION SET", "ATTRIBUTE", "RELATIONSHIP", "PERMISSION"
+    ])
+
+
+# What a condition takes part in, i.e. what changes if it is disabled: the
+# rules it belongs to, the mappings (with their contexts and entities) that
+# run through it, and the roles, attributes and relationships it impacts
+def impact_of_condition(graph, condition):
+    rows = []
+
+    def row(relation, node):
+        rows.append({"CONDITION NAME": condition, "RELATION": relation, "KIND": node[0], "NAME": graph.label(node)})
+
+    for cond_node in graph.named(CONDITION, condition):
+        for rule_node in graph.predecessors(cond_node, "condition"):
+            row("rule", rule_node)
+        for map_node in graph.successors(cond_node, "context mapping"):
+            row("context mapping", map_node)
+            for relation, target in graph.out_edges(map_node):
+                row(relation, target)
+        for target in graph.successors(cond_node, "impacts"):
+            row("impacts", target)
+    return pd.DataFrame(rows, columns=["CONDITION NAME", "RELATION", "KIND", "NAME"])
+
+
+# Incoming and outgoing edges of the nodes of a kind with the given name
+def neighbors(graph, kind, name):
+    rows = []
+    for node in graph.named(kind, name):
+        rows += [{"DIRECTION": "out", "RELATION": rel, "KIND": target[0], "NAME": graph.label(target)}
+                 for rel, target in graph.out_edges(node)]
+        rows += [{"DIRECTION": "in", "RELATION": rel, "KIND": source[0], "NAME": graph.label(source)}
+                 for rel, source in graph.in_edges(node)]
+    return pd.DataFrame(rows, columns=["DIRECTION", "RELATION", "KIND", "NAME"])
@@ -0,0 +1,147 @@
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# resource is Unix-only; max RSS is simply not reported elsewhere
+try:
+    import resource
+except ImportError:
+    resource = None
+
+logger = logging.getLogger("lineage.diagnostics")
+
+_current_run = contextvars.ContextVar("lineage_run", default=None)
+
+# cProfile and tracemalloc are process-wide: only one profiled or traced run
+# at a time (a second enabled profiler raises ValueError on Python 3.12+)
+_exclusive = threading.Lock()
+
+
+def _max_rss_mib():
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+# One timed stage of a report: wall time, rows produced and memory high-water
+# marks. peak_mib is only measured while tracemalloc is tracing.
+class Stage:
+    def __init__(self, name, seconds, rows=None, peak_mib=None, max_rss_mib=None):
+        self.name = name
+        self.seconds = seconds
+        self.rows = rows
+        self.peak_mib = peak_mib
+        self.max_rss_mib = max_rss_mib
+
+    def to_dict(self):
+        return {
+            "stage": self.name, "seconds": self.seconds, "rows": self.rows,
+            "peak_mib": self.peak_mib, "max_rss_mib": self.max_rss_mib
+        }
+
+
+# Splits a report build into consecutive stages: each done() call closes the
+# stage that started at the previous one. Outside an instrumented_run nothing
+# is recorded.
+class StageTimer:
+    def __init__(self):
+        self.run = _current_run.get()
+        self._counted = None
+        self._start()
+
+    def _start(self):
+        self._tracing = self.run is not None and self.run.trace_memory and tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.reset_peak()
+        self._started = time.perf_counter()
+
+    # Pass rows through, counting them for the stage that consumes them
+    def count(self, rows):
+        self._counted = 0
+        for row in rows:
+            self._counted += 1
+            yield row
+
+    def done(self, name, rows=None):
+        if self.run is not None:
+            if rows is None:
+                rows = self._counted
+            self.run.stages.append(Stage(
+                name, round(time.perf_counter() - self._started, 4), rows,
+                round(tracemalloc.get_traced_memory()[1] / 2**20, 2) if self._tracing else None,
+                _max_rss_mib()
+            ))
+        self._counted = None
+        self._start()
+
+
+# Stages recorded while building one report, plus optional cProfile output
+class Run:
+    def __init__(self, report, profile=False, trace_memory=False):
+        self.report = report
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.seconds = None
+        self.profile_text = None
+
+    def to_dict(self):
+        return {
+            "report": self.report, "seconds": self.seconds,
+            "stages": [stage.to_dict() for stage in self.stages]
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+
+# Record every stage of one report build. The finished run is logged as one
+# JSON line on the "lineage.diagnostics" logger. profile=True runs the build
+# under cProfile and keeps the top functions by cumulative time in
+# run.profile_text; trace_memory=True measures per-stage peaks with
+# tracemalloc, which slows the build down noticeably. Profiled and traced runs
+# wait for each other.
+@contextmanager
+def instrumented_run(report, profile=False, trace_memory=False):
+    if profile or trace_memory:
+        with _exclusive:
+            with _instrumented_run(report, profile, trace_memory) as run:
+                yield run
+    else:
+        with _instrumented_run(report, profile, trace_memory) as run:
+            yield run
+
+
+@contextmanager
+def _instrumented_run(report, profile, trace_memory):
+    run = Run(report, profile, trace_memory)
+    token = _current_run.set(run)
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if profile else None
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield run
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        run.seconds = round(time.perf_counter() - start, 4)
+        if started_tracing:
+            tracemalloc.stop()
+        _current_run.reset(token)
+        if profiler is not None:
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(30)
+            run.profile_text = text.getvalue()
+        logger.info(run.to_json())
@@ -0,0 +1,338 @@
+import re
+
+import pandas as pd
+
+from audit import audit_frame, audit_text, run_audit
+from graph import ATTRIBUTE_DEFINITION, POLICY, RULE, get_lineage_graph
+from instrumentation import StageTimer
+from matcher import SubstringMatcher
+from workbook import get_workbook
+from writers import write_clean_excel_sheets, write_frame, write_json, write_records, write_text_file
+
+
+# Governance lineage records, produced by walking the lineage graph
+EMPTY_CONDITION = {
+    "CONDITION NAME": "", "IMPACTED ROLES": "", "IMPACTED ATTRIBUTES": "", "IMPACTED RELATIONSHIPS": "",
+    "CONDITION DISPLAY NAME": ""
+}
+EMPTY_CONTEXT = {
+    "CONTEXT NAME": "", "CONTEXT TYPE AND NAME": "", "WORKFLOW ACTIVITY": "",
+    "WORKFLOW ACTIVITY ACTION(s)": "", "WORKFLOW ACTIVITY CRITERIA": ""
+}
+
+
+def lineage_record(rule, cond, map_row, for_context, context_data):
+    return {
+        "RULE NAME": rule["RULE NAME"], "TYPE": rule["TYPE"], "DEFINITION": rule["DEFINITION"],
+        "RULE DISPLAY NAME": rule["RULE DISPLAY NAME"],
+        "CONDITION NAME": cond["CONDITION NAME"], "IMPACTED ROLES": cond["IMPACTED ROLES"],
+        "IMPACTED ATTRIBUTES": cond["IMPACTED ATTRIBUTES"], "IMPACTED RELATIONSHIPS": cond["IMPACTED RELATIONSHIPS"],
+        "CONDITION DISPLAY NAME": cond["CONDITION DISPLAY NAME"],
+        "ENTITY": map_row["ENTITY"], "MAPPED BUSINESS RULE": map_row["MAPPED BUSINESS RULE"],
+        "MAPPED BUSINESS CONDITION": map_row["MAPPED BUSINESS CONDITION"], "FOR CONTEXT": for_context,
+        **context_data
+    }
+
+
+def _context_data(graph, map_node):
+    contexts = graph.successors(map_node, "context")
+    return graph.attrs(contexts[0]) if contexts else EMPTY_CONTEXT
+
+
+# Yields lineage rows per enabled rule (or only the given rule nodes), falling
+# back from condition contexts to rule contexts to mappings that name the rule
+# directly
+def iter_governance_lineage(graph, rules=None):
+    for rule_node in graph.nodes_of(RULE) if rules is None else rules:
+        rule = graph.attrs(rule_node)
+        matched = False
+
+        for cond_node in graph.successors(rule_node, "condition"):
+            cond = graph.attrs(cond_node)
+            for map_node in graph.successors(cond_node, "context mapping"):
+                map_row = graph.attrs(map_node)
+                yield lineage_record(rule, cond, map_row, map_row["FOR CONTEXT"], _context_data(graph, map_node))
+                matched = True
+
+        if not matched:
+            for map_node in graph.successors(rule_node, "context mapping"):
+                map_row = graph.attrs(map_node)
+                yield lineage_record(rule, EMPTY_CONDITION, map_row, map_row["FOR CONTEXT"], _context_data(graph, map_node))
+                matched = True
+
+        if not matched:
+            for map_node in graph.successors(rule_node, "mapped rule"):
+                yield lineage_record(rule, EMPTY_CONDITION, graph.attrs(map_node), "", EMPTY_CONTEXT)
+
+
+# Governance Lineage Logic
+def generate_governance_lineage(file, fmt="xlsx"):
+    graph = get_lineage_graph(file, ["governance"])
+    stages = StageTimer()
+    lineage_records = iter_governance_lineage(graph)
+    output = write_records(stages.count(lineage_records), fmt)
+    stages.done("traverse and write output")
+    return output
+
+
+# Yields policy -> role -> permission rows from the lineage graph, for every
+# enabled policy or only the given policy nodes
+def iter_auth_lineage(graph, policies=None):
+    for policy_node in graph.nodes_of(POLICY) if policies is None else policies:
+        policy = graph.attrs(policy_node)
+        for map_node in graph.successors(policy_node, "mapping"):
+            map_row = graph.attrs(map_node)
+            for set_node in graph.successors(map_node, "permission set"):
+                for perm_node in graph.successors(set_node, "permission"):
+                    perm_row = graph.attrs(perm_node)
+                    yield {
+                        "POLICY": policy["POLICY"], "ENTITY TYPE": policy["ENTITY TYPE"], "CONDITION": policy["CONDITION"],
+                        "ROLE": map_row["ROLE"],
+                        "PERMISSION SET": perm_row["PERMISSION SET"], "ATTRIBUTE": perm_row["ATTRIBUTE"],
+                        "RELATIONSHIP": perm_row["RELATIONSHIP"], "PERMISSION": perm_row["PERMISSION"]
+                    }
+
+
+# Dynamic Authorization Logic
+def generate_auth_lineage(file, fmt="xlsx"):
+    graph = get_lineage_graph(file, ["authorization"])
+    stages = StageTimer()
+    lineage_records = iter_auth_lineage(graph)
+    output = write_records(stages.count(lineage_records), fmt)
+    stages.done("traverse and write output")
+    return output
+
+
+# Keyword Analysis Logic
+# Rule engine functions reported on, one entry each (matched case-insensitively)
+KEYWORDS = [
+    "GetEntityBusinessConditionScore", "ContextsHave", "IsContextChanged", "GetContextPath", "GetEntityId",
+    "GetEntityIds", "GetEntityType", "GetEntityVersion", "GetEntityName", "GetEntityProperty",
+    "GetCurrentWorkflowAssignedUser", "GetLocalesOfChangedData", "GetCurrentWorkflowStep", "GetAllContexts",
+    "GetChildContexts", "HasContextLinks", "HaveErrorsInContext", "IsEntityDeleted", "IsEntityInWorkflow",
+    "IsEntityInWorkflowInContext", "SetEntityProperty", "GetConfigKeyValue", "GenerateUniqueId", "GetWeekOfYear",
+    "AttributesHaveErrorsInContext", "GetAttributeValue", "GetAttributeValueFromContext",
+    "GetAttributeValuesFromContext", "GetAttributeValueWithDefault", "GetAttributeValues",
+    "GetAttributeValuesWithDefault", "GetAttributeValuesWithDefaultFromContext",
+    "GetAttributeValueWithDefaultFromContext", "GetAttributeValueReferenceId", "GetAttributeValueReferenceIds",
+    "GetAttributeValueProperty", "GetEntityAttributeValuesById", "GetEntityAttributeValueById",
+    "GetEntityAttributeValueByIdInContext", "GetNestedAttributeComputedValue", "GetNestedAttributeValues",
+    "GetNestedAttributeRow", "GetNestedAttributeRows", "DeleteNestedAttributeRows", "GetEntityNestedAttributeRow",
+    "GetEntityNestedAttributeRows", "GetNestedAttributeValueReferenceID", "GetChildAttributefromNestedRowString",
+    "GetRelatedEntityIdByAttributeValue", "GetRelatedEntityIdByAttributeValueFromContext",
+    "GetRelatedEntityIdsByAttributeValue", "GetRelatedEntityIdsByAttributeValueFromContext", "HaveAnyAttributesChanged",
+    "HaveAnyAttributesChangedInContext", "HaveAnyRelationshipAttributesChanged", "HaveAttributesChanged",
+    "HaveAttributesChangedInContext", "IsAttributeLocalizable", "ValidateEmptyAttributes",
+    "ValidateEmptyAttributesInContext", "DeleteAttribute", "DeleteEntityAttribute", "DeleteAttributeInContext",
+    "DeleteRelationshipAttributeInContext", "GetExternalSourceOfAttribute", "GetEntitiesAttributesValues",
+    "HaveOnlySpecifiedAttributesChanged", "GetMappedAttributeNames", "GetDeeplyNestedAttributeJSON",
+    "GetEntityDeeplyNestedAttributeJSON", "GetAttributePreviousValues", "AreRelationshipsDeleted",
+    "CheckIfAllRelationshipAttributeValueIs", "CheckIfAnyRelationshipAttributeValueIs",
+    "CheckIfAllRelatedEntityAttributeValueIs", "CheckIfAnyRelatedEntityAttributeValueIs", "GetCurrentRelatedEntityIds",
+    "GetRelatedEntityIdForContext", "GetRelatedEntityId", "GetRelatedEntityIds", "GetRelatedEntityIdsForContext",
+    "GetRelatedEntityIdByRelationshipAttributeValue", "GetRelatedEntityIdsByRelationshipAttributeValue",
+    "GetRelatedEntityIdByRelationshipAttributeValueFromContext",
+    "GetRelatedEntityIdsByRelationshipAttributeValueFromContext", "GetRelationshipAttributevalue",
+    "GetRelationshipAttributevalues", "HaveRelationships", "HaveRelationshipsInContext", "HaveRelationshipsChanged",
+    "RelationshipsHaveErrorsInContext", "RelationshipsCountInContext", "ValidateEmptyRelationshipAttributes",
+    "ValidateEmptyRelationshipAttributesInContext", "ValidateEmptyAttributesForRelatedEntities",
+    "ValidateEmptyAttributesForRelatedEntitiesInContext", "WhereUsedRelationship", "IsInheritanceBlocked",
+    "GetWhereUsedEntityIds", "IsCurrentUserInRole", "CurrentUser", "GetImpersonateUser", "GetUserOwnershipData",
+    "GetUserOwnershipEditData", "GetUserOwnershipDataCollection", "GetUserOwnershipEditDataCollection",
+    "GetUserProperty", "StopBRExecution", "ValidateExternalLink", "GetClientAttributesFromRequest",
+    "GetDefaultLocaleForTenant", "GetGlobalVariable", "GetRestAPIResponse", "GetUniqueId", "JoinStringCollection",
+    "SetVariable", "SetGlobalVariable", "ValidateByRegex", "GetOriginatingClientId", "GetClientId",
+    "ValidateGTINCheckDigit", "ValidateISBNCheckDigit", "CalculateGTINCheckDigit", "GetValueByJsonPath",
+    "ExtractUOMInfo", "ValidateLuhnAlgorithm", "HasSrcAloneChanged", "URLEncode", "AddToContext", "DeleteContext",
+    "AddNestedAttributeRow", "AddNestedAttributeRowInContext", "SetAttributeValue", "SetAttributeValueInContext",
+    "SetAttributeValues", "SetAttributeValuesInContext", "SetNestedChildAttributeByCondition",
+    "SetDeeplyNestedAttributeJSON", "DeleteRelationships", "SetRelationshipAttribute",
+    "SetRelationshipAttributeFromRelatedEntity", "AddRelationshipInContextByEntityId", "CopyAttributeValueToGovern",
+    "GetBusinessConditionStatus", "GetEntityBusinessConditionStatus", "AddAttributeError", "AddAttributeInformation",
+    "AddContextError", "AddContextInformation", "AddContextWarning", "AddAttributeErrorInContext",
+    "AddAttributeInformationInContext", "AddAttributeWarningInContext", "AddRelationshipAttributeError",
+    "AddRelationshipAttributeInformation", "AddRelationshipAttributeWarning", "AddRelationshipAttributeErrorInContext",
+    "AddRelationshipAttributeInformationInContext", "AddRelationshipError", "AddRelationshipInformation",
+    "AddRelationshipWarning", "AddRelationshipInformationInContext", "AddRelationshipErrorInContext",
+    "AddRelationshipWarningInContext", "AddAttributeWarning", "ValidatePhone", "ChangeAssignment",
+    "ChangeAssignmentInContext", "InitiateExport", "InitiateExportInContext", "InitiateExportInLocale",
+    "InitiateExportInContextAndLocale", "InitiateExportForDeletedEntity", "InitiateExportForDeletedEntityInContext",
+    "InitiateExportForEntity", "InitiateExportForRelatedEntity", "InitiateExportForDeletedEntityInContextAndLocale",
+    "InvokeWorkflow", "InvokeWorkflowInContext", "ResumeWorkflow", "ResumeWorkflowInContext", "ScheduleEntityForExport",
+    "ScheduleEntityForGraphProcessing", "ScheduleWhereUsedEntitiesForGraphProcessing", "SendEntityForGraphProcessing",
+    "SendWhereUsedEntitiesForGraphProcessing", "SendEmail", "CreateSnapshot", "RestoreSnapshot",
+    "ExportApprovedVersion", "CreateAndExportApprovedVersion", "CreateEntity", "DeleteEntity", "ManageAddress",
+    "GetWorkflowComment", "GetEntityCurrentWorkflowStep", "EndWorkflow", "GenerateVariants",
+    "ScheduleOrSendEntityForGraphProcessing", "SetEntityAttributeValue", "SetEntityAttributeValueForContext",
+    "AddEntityNestedAttributeRow", "SetEntityDeeplyNestedAttributeJSON", "CheckIfAnyWhereUsedEntityAttributeValueIs",
+    "GetChangedNestedAttributeRows", "GetDeletedNestedAttributeRows", "ResumeRelatedEntityWorkflow",
+    "ScheduleRelatedEntitiesForGraphProcessing", "SendRelatedEntitiesForGraphProcessing",
+    "SetRelatedEntityAttributeValue", "SetRelatedEntityAttributeValueForContext",
+    "WhereUsedRelationshipsCountInContext", "GetConnectorState", "SetConnectorState", "InvokeConnectorState",
+    "AttributeInContext", "SortedAttributeValues", "SortedAttributeValuesFromContext", "GetApplicationURL",
+    "CurrentWorkflowStepStartDate", "ContextType", "ContextPath"
+]
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+# Yields, per definition, the set of lowercased keywords it contains. Keywords
+# made only of word characters can only occur inside a single word, so each
+# definition is tokenized once and each distinct word is run through the
+# keyword automaton once for the whole model.
+def scan_keywords(definitions, keywords):
+    matcher = SubstringMatcher(keyword.lower() for keyword in keywords)
+    by_word = all(WORD_PATTERN.fullmatch(pattern) for pattern in matcher.patterns)
+    word_hits = {}
+    for definition in definitions:
+        if not isinstance(definition, str):
+            yield set()
+            continue
+        text = definition.lower()
+        if not by_word:
+            yield matcher.find(text)
+            continue
+        hits = set()
+        for word in set(WORD_PATTERN.findall(text)):
+            found = word_hits.get(word)
+            if found is None:
+                found = word_hits[word] = matcher.find(word)
+            hits |= found
+        yield hits
+
+
+def generate_keyword_analysis(file, include_matrix=False, fmt="xlsx"):
+    if include_matrix and fmt != "xlsx":
+        raise ValueError("The rule x keyword matrix sheet is only available in xlsx output")
+    stages = StageTimer()
+    df_rules = get_workbook(file).sheet("BUSINESS RULES", ["NAME", "DEFINITION", "IS ENABLED?"])
+    stages.done("read sheets", rows=len(df_rules))
+
+    # Filter enabled rules
+    df_rules = df_rules[df_rules["IS ENABLED?"] == "Yes"]
+    stages.done("filter columns", rows=len(df_rules))
+
+    # One (rule, keyword) row per keyword found in a rule's DEFINITION
+    pairs = [
+        (name, keyword)
+        for name, hits in zip(df_rules["NAME"], scan_keywords(df_rules["DEFINITION"], KEYWORDS))
+        for keyword in hits
+    ]
+    df_pairs = pd.DataFrame(pairs, columns=["RULE NAME", "Keyword"])
+    counts = df_pairs.dropna(subset=["RULE NAME"]).groupby("Keyword")["RULE NAME"].nunique()
+
+    results = [{"Keyword": keyword, "Count of Matching Rules": int(counts.get(keyword.lower(), 0))} for keyword in KEYWORDS]
+
+    # ✅ Handle empty or mismatched cases safely
+    df_output = pd.DataFrame(results)
+
+    if not df_output.empty and "Count of Matching Rules" in df_output.columns:
+        df_output = df_output.sort_values(by="Count of Matching Rules", ascending=False)
+    else:
+        df_output = pd.DataFrame([{"Keyword": "No matches found", "Count of Matching Rules": 0}])
+    stages.done("scan keywords", rows=len(df_pairs))
+
+    if not include_matrix:
+        output = write_frame(df_output, fmt)
+        stages.done("write output", rows=len(df_output))
+        return output
+
+    # Sparse rule x keyword matrix: one row per keyword a rule uses
+    keyword_names = {keyword.lower(): keyword for keyword in KEYWORDS}
+    keyword_order = {keyword.lower(): i for i, keyword in enumerate(KEYWORDS)}
+    df_matrix = df_pairs.assign(order=df_pairs["Keyword"].map(keyword_order))
+    df_matrix = df_matrix.sort_values(by=["RULE NAME", "order"], kind="stable")
+    df_matrix = df_matrix.assign(Keyword=df_matrix["Keyword"].map(keyword_names))[["RULE NAME", "Keyword"]]
+    output = write_clean_excel_sheets({"Keyword Counts": df_output, "Rule Keyword Matrix": df_matrix})
+    stages.done("write output", rows=len(df_output) + len(df_matrix))
+    return output
+
+
+# Unused Business Rules Logic
+# Sorted names of enabled rules no enabled condition or mapping refers to
+def find_unused_business_rules(file):
+    stages = StageTimer()
+    model = get_workbook(file)
+    df_rules = model.sheet("BUSINESS RULES", ["NAME", "IS ENABLED?"])
+    df_conditions = model.sheet("BUSINESS CONDITIONS", ["MAPPED BUSINESS RULE(s)", "IS ENABLED?"])
+    df_mapping = model.sheet("GOVERNANCE MAPPING", ["MAPPED BUSINESS RULE", "IS ENABLED?"])
+    stages.done("read sheets", rows=len(df_rules) + len(df_conditions) + len(df_mapping))
+
+    df_rules = df_rules[df_rules["IS ENABLED?"] == "Yes"]
+    rule_names = set(df_rules["NAME"].dropna().astype(str))
+
+    condition_rules = df_conditions[df_conditions["IS ENABLED?"] == "Yes"]["MAPPED BUSINESS RULE(s)"].dropna().astype(str)
+    mapped_condition_rules = set()
+    for entry in condition_rules:
+        mapped_condition_rules.update([rule.strip() for rule in entry.split("||")])
+
+    mapping_rules = df_mapping[df_mapping["IS ENABLED?"] == "Yes"]["MAPPED BUSINESS RULE"].dropna().astype(str)
+    mapped_mapping_rules = set()
+    for entry in mapping_rules:
+        mapped_mapping_rules.update([rule.strip() for rule in entry.split("||")])
+
+    all_mapped_rules = mapped_condition_rules.union(mapped_mapping_rules)
+    stages.done("collect mapped rules", rows=len(all_mapped_rules))
+    return sorted(list(rule_names - all_mapped_rules))
+
+
+def generate_unused_business_rules(file, fmt="xlsx"):
+    df_unused = pd.DataFrame({"Unused Business Rules": find_unused_business_rules(file)})
+    stages = StageTimer()
+    output = write_frame(df_unused, fmt)
+    stages.done("write output", rows=len(df_unused))
+    return output
+
+# -------------------------------
+# Data Model Lineage Logic
+# -------------------------------
+DATA_MODEL_LINEAGE_COLUMNS = ["NAME", "ENTITY", "DISPLAY NAME", "DATA TYPE", "USES REFERENCE DATA", "PATH ROOT NODE"]
+
+
+# Yields attribute -> entity rows per ATTRIBUTES row, for every attribute or
+# only the given attribute nodes
+def iter_data_model_lineage(graph, attributes=None):
+    if attributes is None:
+        definitions = graph.nodes_of(ATTRIBUTE_DEFINITION)
+    else:
+        definitions = [node for attr_node in attributes for node in graph.predecessors(attr_node, "defines")]
+    for def_node in definitions:
+        attr = graph.attrs(def_node)
+        for attr_node in graph.successors(def_node, "defines"):
+            for entity_node in graph.successors(attr_node, "entity"):
+                yield {
+                    "NAME": attr["NAME"], "ENTITY": graph.name_of(entity_node), "DISPLAY NAME": attr["DISPLAY NAME"],
+                    "DATA TYPE": attr["DATA TYPE"], "USES REFERENCE DATA": attr["USES REFERENCE DATA"],
+                    "PATH ROOT NODE": attr["PATH ROOT NODE"]
+                }
+
+
+def generate_data_model_lineage(file, fmt="xlsx"):
+    graph = get_lineage_graph(file, ["data model"])
+    stages = StageTimer()
+    df_merged = pd.DataFrame(list(iter_data_model_lineage(graph)), columns=DATA_MODEL_LINEAGE_COLUMNS)
+    df_merged = df_merged.sort_values(by="NAME", kind="stable")
+    stages.done("traverse", rows=len(df_merged))
+
+    # Return output file as BytesIO
+    output = write_frame(df_merged, fmt)
+    stages.done("write output", rows=len(df_merged))
+    return output
+
+
+# -------------------------------
+# Data Model Audit Report Logic
+# -------------------------------
+# Text report by default; "json" gives {check title: names} and any tabular
+# format one CHECK / NAME row per finding. Checks are registered in audit.py.
+def generate_data_model_audit(file, fmt="txt"):
+    results = run_audit(file)
+    stages = StageTimer()
+    if fmt == "txt":
+        output = write_text_file(audit_text(results))
+    elif fmt == "json":
+        output = write_json(results)
+    else:
+        output = write_frame(audit_frame(results), fmt)
+    stages.done("write output", rows=sum(len(names) for names in results.values()))
+    return output
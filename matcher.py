@@ -0,0 +1,54 @@
+from collections import deque
+
+
+# Aho-Corasick automaton over a set of literal patterns. Patterns are matched
+# as plain substrings (no regex), and every pattern occurring in a text is
+# found in one pass over that text, however many patterns there are.
+class SubstringMatcher:
+    def __init__(self, patterns):
+        self.patterns = list(dict.fromkeys(p for p in patterns if isinstance(p, str) and p))
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for index, pattern in enumerate(self.patterns):
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                node = nxt
+            self._out[node] = self._out[node] + (index,)
+
+        # Breadth-first pass to fill failure links and merge outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    # Indexes (into self.patterns) of every pattern contained in text
+    def find_indexes(self, text):
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+    # Every pattern contained in text
+    def find(self, text):
+        return {self.patterns[i] for i in self.find_indexes(text)}
@@ -0,0 +1,234 @@
+from collections import Counter, defaultdict
+
+import pandas as pd
+
+from audit import AUDIT_SHEETS, run_audit
+from graph import (
+    ATTRIBUTE, CONDITION, CONTEXT, MAPPING, PERMISSION, POLICY, POLICY_MAPPING, RULE, SECTION_SHEETS, available_sections,
+    get_lineage_graph
+)
+from instrumentation import StageTimer
+from lineage import (
+    DATA_MODEL_LINEAGE_COLUMNS, find_unused_business_rules, iter_auth_lineage, iter_data_model_lineage,
+    iter_governance_lineage
+)
+from workbook import get_workbook
+from writers import write_clean_excel_sheets
+
+# Change report between two versions of a model. Rows of every sheet are
+# fingerprinted; only the rules, policies and attributes whose lineage can be
+# reached from a changed row are walked again, in both versions' lineage
+# graphs, and their lineage rows compared.
+
+GOVERNANCE_COLUMNS = [
+    "RULE NAME", "TYPE", "DEFINITION", "RULE DISPLAY NAME", "CONDITION NAME", "IMPACTED ROLES", "IMPACTED ATTRIBUTES",
+    "IMPACTED RELATIONSHIPS", "CONDITION DISPLAY NAME", "ENTITY", "MAPPED BUSINESS RULE", "MAPPED BUSINESS CONDITION",
+    "FOR CONTEXT", "CONTEXT NAME", "CONTEXT TYPE AND NAME", "WORKFLOW ACTIVITY", "WORKFLOW ACTIVITY ACTION(s)",
+    "WORKFLOW ACTIVITY CRITERIA"
+]
+AUTH_COLUMNS = ["POLICY", "ENTITY TYPE", "CONDITION", "ROLE", "PERMISSION SET", "ATTRIBUTE", "RELATIONSHIP", "PERMISSION"]
+
+# Section -> (kind of the nodes lineage is computed per, lineage iterator,
+# record columns, columns identifying an edge, relations leading back from a
+# changed node to those roots)
+SECTIONS = {
+    "governance": (
+        RULE, iter_governance_lineage, GOVERNANCE_COLUMNS,
+        ["RULE NAME", "CONDITION NAME", "ENTITY", "MAPPED BUSINESS RULE", "MAPPED BUSINESS CONDITION", "FOR CONTEXT"],
+        {"condition", "context mapping", "mapped rule", "context"}
+    ),
+    "authorization": (
+        POLICY, iter_auth_lineage, AUTH_COLUMNS,
+        ["POLICY", "ROLE", "PERMISSION SET", "ATTRIBUTE", "RELATIONSHIP"],
+        {"mapping", "permission set", "permission"}
+    ),
+    "data model": (
+        ATTRIBUTE, iter_data_model_lineage, DATA_MODEL_LINEAGE_COLUMNS,
+        ["NAME", "ENTITY"],
+        set()
+    ),
+}
+
+# Sheet -> graph node a row of it stands for, given the row and its Excel row
+# number (see graph.py for how nodes are keyed)
+SHEET_NODES = {
+    "BUSINESS RULES": lambda row, excel_row: (RULE, excel_row),
+    "BUSINESS CONDITIONS": lambda row, excel_row: (CONDITION, excel_row),
+    "GOVERNANCE MAPPING": lambda row, excel_row: (MAPPING, excel_row),
+    "CONTEXTS": lambda row, excel_row: (CONTEXT, row.get("NAME")),
+    "POLICY": lambda row, excel_row: (POLICY, excel_row),
+    "POLICY MAPPING": lambda row, excel_row: (POLICY_MAPPING, excel_row),
+    "POLICY PERMISSIONS": lambda row, excel_row: (PERMISSION, excel_row),
+    "ATTRIBUTES": lambda row, excel_row: (ATTRIBUTE, row.get("NAME")),
+    "E-A-R MODEL": lambda row, excel_row: (ATTRIBUTE, row.get("MAPPED ATTRIBUTE")),
+}
+
+CHANGE_COLUMNS = ["MODEL", "CHANGE", "CHANGED FIELDS", "PREVIOUS VALUES"]
+
+
+# A cell as a plain value whatever its column's dtype: blank is None and a
+# whole float an int, so 7 in an int column and 7.0 in a column a blank cell
+# turned into floats hash the same
+def _cell_key(value):
+    if pd.isna(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+# One 64-bit hash per row of a sheet, over all of its columns; empty when the
+# workbook has no such sheet. Rows are hashed as plain values, so the same row
+# gets the same hash in both versions even if a column's dtype changed.
+def row_fingerprints(model, sheet):
+    if sheet not in model.sheet_names():
+        return pd.DataFrame(), []
+    df = model.sheet(sheet, model.columns(sheet))
+    keys = pd.DataFrame({col: [_cell_key(v) for v in df[col].tolist()] for col in df.columns}, dtype=object)
+    return df, list(pd.util.hash_pandas_object(keys, index=False, categorize=False))
+
+
+# Positions of the rows only in the previous version and of those only in the
+# current one. Rows are matched by content, so moved rows don't count;
+# duplicated rows count when their number changes.
+def changed_rows(previous, current, sheet):
+    df_old, old = row_fingerprints(previous, sheet)
+    df_new, new = row_fingerprints(current, sheet)
+    old_counts, new_counts = Counter(old), Counter(new)
+    removed = [i for i, h in enumerate(old) if old_counts[h] != new_counts[h]]
+    added = [i for i, h in enumerate(new) if old_counts[h] != new_counts[h]]
+    return (df_old, removed), (df_new, added)
+
+
+def _row_nodes(sheet, df, positions):
+    to_node = SHEET_NODES[sheet]
+    rows = df.iloc[positions].to_dict("records")
+    return [to_node(row, position + 2) for position, row in zip(positions, rows)]
+
+
+# Names of the root nodes of a section whose lineage can change with the given
+# nodes of one version's graph. Names, not nodes, carry over to the other
+# version, since row nodes are keyed by Excel row.
+def affected_roots(graph, nodes, root_kind, relations):
+    roots = set()
+    for node in nodes:
+        if node not in graph.nodes:
+            continue
+        if node[0] == root_kind:
+            roots.add(graph.name_of(node))
+        roots.update(graph.name_of(n) for n in graph.reachable(node, relations, reverse=True) if n[0] == root_kind)
+    return roots
+
+
+def _root_nodes(graph, root_kind, names):
+    return [node for node in graph.nodes_of(root_kind) if graph.name_of(node) in names]
+
+
+def _plain(value):
+    return None if pd.isna(value) else value
+
+
+def _sort_key(key):
+    return tuple("" if v is None else str(v) for v in key)
+
+
+# Added, removed and changed lineage edges between two sets of lineage
+# records. An edge is identified by key_columns; an edge whose other columns
+# differ is reported as changed.
+def compare_records(section, old_records, new_records, columns, key_columns):
+    value_columns = [col for col in columns if col not in key_columns]
+
+    def by_key(records):
+        grouped = defaultdict(list)
+        for record in records:
+            grouped[tuple(_plain(record[col]) for col in key_columns)].append(
+                tuple(_plain(record[col]) for col in value_columns)
+            )
+        return grouped
+
+    old, new = by_key(old_records), by_key(new_records)
+    rows = []
+
+    def row(change, key, values, changed="", previous=""):
+        return {"MODEL": section, "CHANGE": change, "CHANGED FIELDS": changed, "PREVIOUS VALUES": previous,
+                **dict(zip(key_columns, key)), **dict(zip(value_columns, values))}
+
+    # Per key, values only in one version are paired up as changed edges;
+    # whatever is left over was added or removed
+    for key in sorted(set(old) | set(new), key=_sort_key):
+        old_only = list((Counter(old.get(key, [])) - Counter(new.get(key, []))).elements())
+        new_only = list((Counter(new.get(key, [])) - Counter(old.get(key, []))).elements())
+        for before, after in zip(old_only, new_only):
+            changed = [(col, a) for col, a, b in zip(value_columns, before, after) if a != b]
+            rows.append(row(
+                "changed", key, after, ", ".join(col for col, _ in changed),
+                "; ".join(f"{col}: {'' if a is None else a}" for col, a in changed)
+            ))
+        rows.extend(row("added", key, values) for values in new_only[len(old_only):])
+        rows.extend(row("removed", key, values) for values in old_only[len(new_only):])
+    return rows
+
+
+# Row-level changes of every sheet of every section present in either version,
+# the lineage edges that changed as a result, and rules, entities and
+# relationships that are unused now but were not before
+def compare_models(previous, current):
+    stages = StageTimer()
+    old_model, new_model = get_workbook(previous), get_workbook(current)
+    old_sections, new_sections = available_sections(old_model), available_sections(new_model)
+    summary, edge_rows, unused_rows = [], [], []
+    if old_model.key == new_model.key:
+        return summary, edge_rows, unused_rows
+
+    for section, (root_kind, iter_lineage, columns, key_columns, relations) in SECTIONS.items():
+        if section not in old_sections and section not in new_sections:
+            continue
+        old_nodes, new_nodes = [], []
+        for sheet in SECTION_SHEETS[section]:
+            (df_old, removed), (df_new, added) = changed_rows(old_model, new_model, sheet)
+            summary.append({"MODEL": section, "SHEET": sheet, "ROWS REMOVED": len(removed), "ROWS ADDED": len(added)})
+            old_nodes += _row_nodes(sheet, df_old, removed)
+            new_nodes += _row_nodes(sheet, df_new, added)
+        stages.done(f"fingerprint {section} sheets", rows=len(old_nodes) + len(new_nodes))
+        if not old_nodes and not new_nodes:
+            continue
+
+        old_graph = get_lineage_graph(old_model, [section] if section in old_sections else [])
+        new_graph = get_lineage_graph(new_model, [section] if section in new_sections else [])
+        roots = (affected_roots(old_graph, old_nodes, root_kind, relations) |
+                 affected_roots(new_graph, new_nodes, root_kind, relations))
+        old_records = iter_lineage(old_graph, _root_nodes(old_graph, root_kind, roots))
+        new_records = iter_lineage(new_graph, _root_nodes(new_graph, root_kind, roots))
+        edge_rows += compare_records(section, old_records, new_records, columns, key_columns)
+        stages.done(f"recompute {section} lineage", rows=len(roots))
+
+    old_sheets, new_sheets = set(old_model.sheet_names()), set(new_model.sheet_names())
+    if "governance" in old_sections and "governance" in new_sections:
+        was_unused = set(find_unused_business_rules(old_model))
+        unused_rows += [{"KIND": RULE, "NAME": name} for name in find_unused_business_rules(new_model)
+                        if name not in was_unused]
+    if set(AUDIT_SHEETS) <= old_sheets and set(AUDIT_SHEETS) <= new_sheets:
+        checks = {"Unused Entities": "entity", "Unused Relationships": "relationship"}
+        old_audit, new_audit = run_audit(old_model, list(checks)), run_audit(new_model, list(checks))
+        for check, kind in checks.items():
+            was_unused = set(old_audit[check])
+            unused_rows += [{"KIND": kind, "NAME": name} for name in new_audit[check] if name not in was_unused]
+    stages.done("collect newly unused", rows=len(unused_rows))
+    return summary, edge_rows, unused_rows
+
+
+# Change Report Logic
+def generate_change_report(previous, current):
+    summary, edge_rows, unused_rows = compare_models(previous, current)
+    stages = StageTimer()
+    edge_columns = list(CHANGE_COLUMNS)
+    for section in dict.fromkeys(row["MODEL"] for row in edge_rows):
+        _, _, columns, key_columns, _ = SECTIONS[section]
+        edge_columns += [col for col in key_columns + columns if col not in edge_columns]
+    output = write_clean_excel_sheets({
+        "Summary": pd.DataFrame(summary, columns=["MODEL", "SHEET", "ROWS REMOVED", "ROWS ADDED"]),
+        "Lineage Changes": pd.DataFrame(edge_rows, columns=edge_columns),
+        "Newly Unused": pd.DataFrame(unused_rows, columns=["KIND", "NAME"]),
+    })
+    stages.done("write output", rows=len(edge_rows) + len(unused_rows))
+    return output
@@ -0,0 +1,131 @@
+import random
+
+from lineage import KEYWORDS
+from writers import write_excel_rows
+
+# Synthetic governance, authorization and data-model workbooks with the sheet
+# and column names the generators expect. Row counts and fan-out are
+# configurable and the output is deterministic for a given seed.
+
+CONTEXT_TYPES = ["Channel || web", "Channel || mobile", "Locale || en-US", "Locale || de-DE"]
+
+
+# Fixed-width names, so that no name is a substring of another and the
+# substring matching in the lineage joins only finds the intended links
+def _names(prefix, suffix, n):
+    width = len(str(max(n - 1, 0)))
+    return [f"{prefix}_{i:0{width}d}_{suffix}" for i in range(n)]
+
+
+def _enabled(rnd, ratio=0.9):
+    return "Yes" if rnd.random() < ratio else "No"
+
+
+def governance_model(n_rules=1000, conditions_per_rule=0.5, rules_per_condition=2, contexts_per_owner=2,
+                     mappings_per_context=2, keywords_per_rule=5, seed=0):
+    rnd = random.Random(seed)
+    rules = _names("BR", "Rule", n_rules)
+    conditions = _names("BC", "Condition", int(n_rules * conditions_per_rule))
+
+    rule_rows = [
+        (name, f"{name} display", rnd.choice(["Validation", "Transformation"]),
+         " && ".join(f"{rnd.choice(KEYWORDS)}(\"attr{rnd.randrange(500)}\")" for _ in range(keywords_per_rule)),
+         _enabled(rnd))
+        for name in rules
+    ]
+    condition_rows = [
+        (name, f"{name} display", " || ".join(rnd.sample(rules, min(rules_per_condition, len(rules)))),
+         "admin || vendor", f"attr{rnd.randrange(500)}", f"rel{rnd.randrange(50)}", _enabled(rnd))
+        for name in conditions
+    ]
+
+    context_rows = []
+    mapping_rows = []
+    for owner in rules + conditions:
+        for i in range(contexts_per_owner):
+            context_name = f"{owner}{'' if i == 0 else i}Context"
+            context_type = rnd.choice(CONTEXT_TYPES)
+            context_rows.append((context_name, context_type, context_type, f"activity{rnd.randrange(20)}",
+                                 "Approve || Reject", f"criteria{rnd.randrange(20)}"))
+            for _ in range(mappings_per_context):
+                mapping_rows.append((f"entity{rnd.randrange(30)}", rnd.choice(rules), rnd.choice(conditions or rules),
+                                     context_name, _enabled(rnd)))
+
+    return write_excel_rows({
+        "BUSINESS RULES": (["NAME", "DISPLAY NAME", "TYPE", "DEFINITION", "IS ENABLED?"], rule_rows),
+        "BUSINESS CONDITIONS": ([
+            "NAME", "DISPLAY NAME", "MAPPED BUSINESS RULE(s)", "IMPACTED ROLES", "IMPACTED ATTRIBUTES",
+            "IMPACTED RELATIONSHIPS", "IS ENABLED?"
+        ], condition_rows),
+        "GOVERNANCE MAPPING": (
+            ["ENTITY", "MAPPED BUSINESS RULE", "MAPPED BUSINESS CONDITION", "FOR CONTEXT", "IS ENABLED?"], mapping_rows
+        ),
+        "CONTEXTS": ([
+            "NAME", "CONTEXT TYPE || CONTEXT NAME", "CONTEXT TYPE || CONTEXT NAME", "WORKFLOW ACTIVITY",
+            "WORKFLOW ACTIVITY ACTION(s)", "WORKFLOW ACTIVITY CRITERIA"
+        ], context_rows),
+    }).getvalue()
+
+
+def authorization_model(n_policies=1000, n_permission_sets=200, mappings_per_policy=3, permissions_per_set=20, seed=0):
+    rnd = random.Random(seed)
+    policies = _names("DA", "Policy", n_policies)
+    permission_sets = _names("PS", "Set", n_permission_sets)
+
+    policy_rows = [(name, f"entity{rnd.randrange(30)}", f"condition{rnd.randrange(100)}", _enabled(rnd)) for name in policies]
+    mapping_rows = [
+        (name, rnd.choice(["admin", "vendor", "buyer", "steward"]), rnd.choice(permission_sets))
+        for name in policies for _ in range(mappings_per_policy)
+    ]
+    permission_rows = [
+        (perm_set, f"attr{rnd.randrange(500)}", f"rel{rnd.randrange(50)}", rnd.choice(["View", "Edit", "Delete"]))
+        for perm_set in permission_sets for _ in range(permissions_per_set)
+    ]
+
+    return write_excel_rows({
+        "POLICY": (["POLICY", "ENTITY TYPE", "CONDITION", "ENABLED"], policy_rows),
+        "POLICY MAPPING": (["POLICY", "ROLE", "PERMISSION SET"], mapping_rows),
+        "POLICY PERMISSIONS": (["PERMISSION SET", "ATTRIBUTE", "RELATIONSHIP", "PERMISSION"], permission_rows),
+    }).getvalue()
+
+
+def data_model(n_attributes=5000, n_entities=200, n_relationships=100, nested_ratio=0.05, children_per_nested=5,
+               mappings_per_attribute=2, unused_ratio=0.1, seed=0):
+    rnd = random.Random(seed)
+    entities = [f"entity{i}" for i in range(n_entities)]
+    relationships = [f"rel{i}" for i in range(n_relationships)]
+    attributes = [f"attr{i}" for i in range(n_attributes)]
+    nested_parents = attributes[:int(n_attributes * nested_ratio)]
+    nested_parent_names = set(nested_parents)
+
+    attribute_rows = []
+    for name in attributes:
+        is_parent = name in nested_parent_names
+        attribute_rows.append((
+            name, name.upper(), rnd.choice(["string", "integer", "decimal", "date"]), rnd.choice(["Yes", "No"]), None,
+            "nestedgrid" if is_parent else "textbox", None, None
+        ))
+    for parent in nested_parents:
+        has_identifier = rnd.random() < 0.8
+        for i in range(children_per_nested):
+            attribute_rows.append((
+                f"{parent}_child{i}", f"{parent} child {i}", "string", "No", parent, "textbox", parent,
+                "Yes" if has_identifier and i == 0 else "No"
+            ))
+
+    used_entities = entities[:int(n_entities * (1 - unused_ratio))] or entities
+    used_relationships = relationships[:int(n_relationships * (1 - unused_ratio))] or relationships
+    ear_rows = [
+        (rnd.choice(used_entities), name, rnd.choice(used_relationships) if rnd.random() < 0.3 else None)
+        for name in attributes[:int(n_attributes * (1 - unused_ratio))] for _ in range(mappings_per_attribute)
+    ]
+
+    return write_excel_rows({
+        "ENTITIES": (["NAME"], [(name,) for name in entities]),
+        "RELATIONSHIPS": (["NAME"], [(name,) for name in relationships]),
+        "ATTRIBUTES": ([
+            "NAME", "DISPLAY NAME", "DATA TYPE", "USES REFERENCE DATA", "PATH ROOT NODE", "DISPLAY TYPE", "GROUP",
+            "IS NESTED GROUP IDENTIFIER?"
+        ], attribute_rows),
+        "E-A-R MODEL": (["ENTITY", "MAPPED ATTRIBUTE", "MAPPED RELATIONSHIP"], ear_rows),
+    }).getvalue()
@@ -0,0 +1,204 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workbook  # noqa: E402
+from lineage import generate_governance_lineage  # noqa: E402
+from writers import write_clean_excel, write_excel_rows  # noqa: E402
+
+RULE_COLUMNS = ["NAME", "DISPLAY NAME", "TYPE", "DEFINITION", "IS ENABLED?"]
+CONDITION_COLUMNS = [
+    "NAME", "DISPLAY NAME", "MAPPED BUSINESS RULE(s)", "IMPACTED ROLES", "IMPACTED ATTRIBUTES",
+    "IMPACTED RELATIONSHIPS", "IS ENABLED?"
+]
+MAPPING_COLUMNS = ["ENTITY", "MAPPED BUSINESS RULE", "MAPPED BUSINESS CONDITION", "FOR CONTEXT", "IS ENABLED?"]
+# Column D repeats column B's header; the lineage reads the second one
+CONTEXT_COLUMNS = [
+    "NAME", "CONTEXT TYPE || CONTEXT NAME", "DESCRIPTION", "CONTEXT TYPE || CONTEXT NAME",
+    "WORKFLOW ACTIVITY", "WORKFLOW ACTIVITY ACTION(s)", "WORKFLOW ACTIVITY CRITERIA"
+]
+
+
+# The governance join as it was before the lineage graph, frozen as the
+# reference the graph walk has to reproduce row for row
+def baseline_governance_lineage(path):
+    xls = pd.ExcelFile(path, engine="openpyxl")
+    df_rules = pd.read_excel(xls, sheet_name="BUSINESS RULES")
+    df_conditions = pd.read_excel(xls, sheet_name="BUSINESS CONDITIONS")
+    df_mapping = pd.read_excel(xls, sheet_name="GOVERNANCE MAPPING")
+    df_contexts = pd.read_excel(xls, sheet_name="CONTEXTS")
+    context_type_name_col = [col for col in df_contexts.columns if col.startswith("CONTEXT TYPE || CONTEXT NAME")][1]
+    df_contexts = df_contexts.rename(columns={"NAME": "CONTEXT NAME", context_type_name_col: "CONTEXT TYPE AND NAME"})
+    df_contexts = df_contexts[[
+        "CONTEXT NAME", "CONTEXT TYPE AND NAME",
+        "WORKFLOW ACTIVITY", "WORKFLOW ACTIVITY ACTION(s)", "WORKFLOW ACTIVITY CRITERIA"
+    ]]
+
+    df_rules = df_rules.rename(columns={"NAME": "RULE NAME", "DISPLAY NAME": "RULE DISPLAY NAME"})
+    df_rules = df_rules[df_rules["IS ENABLED?"] == "Yes"]
+    df_conditions = df_conditions.rename(columns={"NAME": "CONDITION NAME", "DISPLAY NAME": "CONDITION DISPLAY NAME"})
+    df_conditions = df_conditions[df_conditions["IS ENABLED?"] == "Yes"]
+    df_mapping["FOR CONTEXT"] = df_mapping["FOR CONTEXT"].astype(str)
+    df_mapping = df_mapping[df_mapping["IS ENABLED?"] == "Yes"]
+
+    empty_condition = {
+        "CONDITION NAME": "", "IMPACTED ROLES": "", "IMPACTED ATTRIBUTES": "", "IMPACTED RELATIONSHIPS": "",
+        "CONDITION DISPLAY NAME": ""
+    }
+    empty_context = {
+        "CONTEXT NAME": "", "CONTEXT TYPE AND NAME": "", "WORKFLOW ACTIVITY": "",
+        "WORKFLOW ACTIVITY ACTION(s)": "", "WORKFLOW ACTIVITY CRITERIA": ""
+    }
+
+    def record(rule, cond, map_row, for_context, context_data):
+        return {
+            "RULE NAME": rule["RULE NAME"], "TYPE": rule["TYPE"], "DEFINITION": rule["DEFINITION"],
+            "RULE DISPLAY NAME": rule["RULE DISPLAY NAME"],
+            **{col: cond[col] for col in empty_condition},
+            "ENTITY": map_row["ENTITY"], "MAPPED BUSINESS RULE": map_row["MAPPED BUSINESS RULE"],
+            "MAPPED BUSINESS CONDITION": map_row["MAPPED BUSINESS CONDITION"], "FOR CONTEXT": for_context,
+            **context_data
+        }
+
+    def context_mappings(owner):
+        context_keys = [f"{owner}{'' if i == 0 else i}Context" for i in range(16)]
+        for _, map_row in df_mapping[df_mapping["FOR CONTEXT"].isin(context_keys)].iterrows():
+            context_row = df_contexts[df_contexts["CONTEXT NAME"] == map_row["FOR CONTEXT"]]
+            yield map_row, context_row.iloc[0].to_dict() if not context_row.empty else empty_context
+
+    records = []
+    for _, rule in df_rules.iterrows():
+        rule_name = rule["RULE NAME"]
+        matched = False
+        matched_conditions = df_conditions[df_conditions["MAPPED BUSINESS RULE(s)"].str.contains(rule_name, na=False)]
+        for _, cond in matched_conditions.iterrows():
+            for map_row, context_data in context_mappings(cond["CONDITION NAME"]):
+                records.append(record(rule, cond, map_row, map_row["FOR CONTEXT"], context_data))
+                matched = True
+        if not matched:
+            for map_row, context_data in context_mappings(rule_name):
+                records.append(record(rule, empty_condition, map_row, map_row["FOR CONTEXT"], context_data))
+                matched = True
+        if not matched:
+            for _, map_row in df_mapping[df_mapping["MAPPED BUSINESS RULE"] == rule_name].iterrows():
+                records.append(record(rule, empty_condition, map_row, "", empty_context))
+    return write_clean_excel(pd.DataFrame(records))
+
+
+@pytest.fixture(autouse=True)
+def no_disk_cache(monkeypatch):
+    monkeypatch.setattr(workbook, "DISK_CACHE", None)
+    workbook.clear_workbook_cache()
+
+
+def rule(name, definition="", enabled="Yes"):
+    return [name, f"{name} display", "Validation", definition or f"def {name}", enabled]
+
+
+def condition(name, rules, attributes="a1", enabled="Yes"):
+    return [name, f"{name} display", rules, "admin", attributes, None, enabled]
+
+
+def mapping(for_context, rule_name=None, condition_name=None, entity="sku", enabled="Yes"):
+    return [entity, rule_name, condition_name, for_context, enabled]
+
+
+def context(name, activity="wa"):
+    return [name, "t", "d", "Channel || web", activity, f"{activity} action", "c"]
+
+
+def governance_workbook(tmp_path, rules, conditions, mappings, contexts):
+    data = write_excel_rows({
+        "BUSINESS RULES": (RULE_COLUMNS, rules),
+        "BUSINESS CONDITIONS": (CONDITION_COLUMNS, conditions),
+        "GOVERNANCE MAPPING": (MAPPING_COLUMNS, mappings),
+        "CONTEXTS": (CONTEXT_COLUMNS, contexts),
+    }).getvalue()
+    path = tmp_path / "governance.xlsx"
+    path.write_bytes(data)
+    return str(path)
+
+
+def assert_matches_baseline(path):
+    expected = pd.read_excel(baseline_governance_lineage(path))
+    actual = pd.read_excel(generate_governance_lineage(path))
+    pd.testing.assert_frame_equal(actual, expected)
+    return actual
+
+
+def test_duplicate_names_keep_every_row(tmp_path):
+    path = governance_workbook(tmp_path, [
+        rule("R1", "first"), rule("R1", "second"), rule("R3"), rule("R3", "disabled", enabled="No"),
+    ], [
+        condition("C1", "R1", attributes="a1"),
+        condition("C1", "R1 || R3", attributes="a2"),
+        condition("C2", "R3"),
+    ], [
+        mapping("C1Context", "R1", "C1"), mapping("C1Context", "R1", "C1", entity="product"),
+        mapping("C2Context", "R3", "C2"), mapping("R3Context", "R3"),
+    ], [
+        context("C1Context", "first"), context("C1Context", "second"), context("C2Context"),
+    ])
+    actual = assert_matches_baseline(path)
+    assert list(actual.loc[actual["RULE NAME"] == "R3", "IMPACTED ATTRIBUTES"]) == ["a2", "a2", "a1"]
+    assert set(actual.loc[actual["RULE NAME"] == "R1", "DEFINITION"]) == {"first", "second"}
+
+
+def test_context_suffix_collisions(tmp_path):
+    path = governance_workbook(tmp_path, [rule("R1"), rule("R2")], [
+        condition("C1", "R1"), condition("C11", "R2"),
+    ], [
+        mapping("C1Context"), mapping("C11Context"), mapping("C111Context"), mapping("C115Context"),
+        mapping("C116Context"), mapping("C1116Context"), mapping("C16Context"),
+    ], [
+        context("C11Context"), context("C115Context"),
+    ])
+    assert_matches_baseline(path)
+
+
+def test_fallback_tiers(tmp_path):
+    path = governance_workbook(tmp_path, [
+        rule("ViaCondition"), rule("ViaRuleContext"), rule("ViaMappedRule"), rule("Unmapped"),
+    ], [
+        condition("Cond", "ViaCondition"),
+        condition("NoMappings", "ViaRuleContext || ViaMappedRule"),
+        condition("Off", "Unmapped", enabled="No"),
+    ], [
+        mapping("CondContext", "ViaCondition", "Cond"),
+        mapping("ViaRuleContext2Context", "ViaRuleContext"),
+        mapping(None, "ViaMappedRule"),
+        mapping("ElsewhereContext", "ViaMappedRule", entity="product"),
+        mapping("OffContext", "Unmapped", enabled="No"),
+    ], [
+        context("CondContext"), context("ViaRuleContext2Context"),
+    ])
+    actual = assert_matches_baseline(path)
+    assert list(actual["RULE NAME"]) == ["ViaCondition", "ViaRuleContext", "ViaMappedRule", "ViaMappedRule"]
+    assert actual.loc[actual["RULE NAME"] == "ViaMappedRule", "FOR CONTEXT"].isna().all()
+
+
+def test_regex_metacharacters_in_names(tmp_path):
+    path = governance_workbook(tmp_path, [rule("Rule.A"), rule("Rule.A.B"), rule("v1.0")], [
+        condition("Cond.1", "Rule.A.B || v1.0"), condition("Cond.2", "Rule.A"),
+    ], [
+        mapping("Cond.1Context"), mapping("Cond.2Context"), mapping("Cond.21Context"),
+    ], [
+        context("Cond.1Context"),
+    ])
+    assert_matches_baseline(path)
+
+
+# Names are matched as literal text, so characters that are special in a
+# regular expression match only themselves
+def test_names_match_literally(tmp_path):
+    path = governance_workbook(tmp_path, [rule("Rule(1)"), rule("Rule1"), rule("Rule[2]"), rule("Rule2")], [
+        condition("Cond", "Rule(1) || Rule[2]"),
+    ], [
+        mapping("CondContext"),
+    ], [])
+    actual = pd.read_excel(generate_governance_lineage(path))
+    assert list(actual["RULE NAME"]) == ["Rule(1)", "Rule[2]"]
@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_diff import changed_rows, compare_models  # noqa: E402
+from workbook import ParsedWorkbook  # noqa: E402
+from writers import write_excel_rows  # noqa: E402
+
+POLICY_COLUMNS = ["POLICY", "ENTITY TYPE", "CONDITION", "ENABLED", "SEQUENCE"]
+
+
+def auth_model(policies):
+    return ParsedWorkbook(write_excel_rows({
+        "POLICY": (POLICY_COLUMNS, policies),
+        "POLICY MAPPING": (["POLICY", "ROLE", "PERMISSION SET"], [("P1", "admin", "PS1")]),
+        "POLICY PERMISSIONS": (["PERMISSION SET", "ATTRIBUTE", "RELATIONSHIP", "PERMISSION"], [("PS1", "a1", None, "View")]),
+    }).getvalue())
+
+
+# A blank cell turns the int SEQUENCE column into floats; the other rows
+# must still match their previous version
+def test_row_match_survives_dtype_change():
+    policies = [(f"P{i}", "sku", "c", "Yes", i) for i in range(20)]
+    previous = auth_model(policies)
+    current = auth_model(policies + [("P20", "sku", "c", "Yes", None)])
+
+    (_, removed), (_, added) = changed_rows(previous, current, "POLICY")
+    assert (removed, added) == ([], [20])
+
+    summary, _, _ = compare_models(previous, current)
+    policy_summary = [row for row in summary if row["SHEET"] == "POLICY"]
+    assert policy_summary == [{"MODEL": "authorization", "SHEET": "POLICY", "ROWS REMOVED": 0, "ROWS ADDED": 1}]
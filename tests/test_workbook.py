@@ -0,0 +1,57 @@
+import io
+import os
+import re
+import sys
+import zipfile
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workbook import STR_NA_VALUES, ParsedWorkbook  # noqa: E402
+from writers import write_excel_rows  # noqa: E402
+
+COLUMNS = ["NAME", "IS ENABLED?", "VALUE"]
+
+
+# Workbook bytes whose sheet declares the given <dimension>, as exporters
+# other than Excel sometimes get it wrong
+def with_dimension(data, ref):
+    source = zipfile.ZipFile(io.BytesIO(data))
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            content = source.read(item.filename)
+            if item.filename == "xl/worksheets/sheet1.xml":
+                xml = re.sub(r"<dimension [^>]*/>", "", content.decode("utf-8"))
+                xml = xml.replace("<sheetViews>", f'<dimension ref="{ref}" /><sheetViews>', 1)
+                content = xml.encode("utf-8")
+            target.writestr(item, content)
+    return output.getvalue()
+
+
+def assert_matches_read_excel(data, columns):
+    expected = pd.read_excel(io.BytesIO(data), sheet_name="S")
+    model = ParsedWorkbook(data)
+    assert model.columns("S") == list(expected.columns)
+    actual = model.sheet("S", columns)
+    assert len(actual) == len(expected)
+    for col in columns:
+        assert actual[col].isna().equals(expected[col].isna()), col
+        assert list(actual[col].dropna()) == list(expected[col].dropna()), col
+
+
+@pytest.mark.parametrize("ref", ["A1:C3", "A1", "A1:Z100"])
+def test_wrong_dimension_is_ignored(ref):
+    rows = [(f"n{i}", "Yes" if i % 2 else "No", i) for i in range(5)]
+    data = with_dimension(write_excel_rows({"S": (COLUMNS, rows)}).getvalue(), ref)
+    assert_matches_read_excel(data, ["NAME", "IS ENABLED?"])
+    assert_matches_read_excel(data, COLUMNS)
+
+
+def test_na_strings_read_as_blank():
+    values = sorted(STR_NA_VALUES - {""}) + ["ok", "na", "Null", " NA"]
+    rows = [(value, "Yes", value if i % 2 else i) for i, value in enumerate(values)]
+    data = write_excel_rows({"S": (COLUMNS, rows)}).getvalue()
+    assert_matches_read_excel(data, COLUMNS)
@@ -0,0 +1,223 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from disk_cache import default_disk_cache
+
+# Number of parsed workbooks kept in memory across Streamlit reruns
+MAX_CACHED_WORKBOOKS = 4
+
+NAN = float("nan")
+
+# Text cells pd.read_excel reads as NaN by default ("NA", "N/A", "null", the
+# "#N/A" of formula error cells, ...). The set is private to pandas, so its
+# current contents are kept as a fallback.
+try:
+    from pandas._libs.parsers import STR_NA_VALUES
+except ImportError:
+    STR_NA_VALUES = {
+        "-1.#IND", "1.#QNAN", "1.#IND", "-1.#QNAN", "#N/A N/A", "#N/A", "N/A", "n/a", "NA", "<NA>", "#NA",
+        "NULL", "null", "NaN", "-NaN", "nan", "-nan", "None", ""
+    }
+
+# Sheets persisted across sessions (see disk_cache.py); None when disabled
+DISK_CACHE = default_disk_cache()
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+# Read the raw bytes of an upload, a path or any file-like object
+def read_file_bytes(file):
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as fh:
+            return fh.read()
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    file.seek(0)
+    data = file.read()
+    file.seek(0)
+    return data
+
+
+# Header names as pandas reports them: blank headers become "Unnamed: <i>"
+# and repeated names get unique suffixes (.1, .2, etc.)
+def dedupe_columns(cols):
+    new_cols = []
+    seen = {}
+    for i, col in enumerate(cols):
+        if col is None:
+            col = f"Unnamed: {i}"
+        if col in seen:
+            seen[col] += 1
+            new_cols.append(f"{col}.{seen[col]}")
+        else:
+            seen[col] = 0
+            new_cols.append(col)
+    return new_cols
+
+
+# Cell values converted the way pd.read_excel converts them
+def _cell_value(value):
+    if value is None:
+        return NAN
+    if isinstance(value, str) and value in STR_NA_VALUES:
+        return NAN
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+# A workbook parsed at most once: each sheet is read lazily on first use and
+# the same data is handed to every report. Callers must not mutate the
+# returned frames in place.
+#
+# sheet(name, columns) streams only the requested columns through openpyxl's
+# read-only iter_rows and keeps each column once parsed; use
+# sheet(name, columns(name)) for a whole sheet. With a disk_cache, sheet
+# names, headers and parsed columns are loaded from it before the workbook is
+# ever opened, and whatever gets parsed is written back.
+class ParsedWorkbook:
+    def __init__(self, data, key=None, disk_cache=None):
+        self.data = data
+        self.key = key or hashlib.sha256(data).hexdigest()
+        self._disk = disk_cache
+        self._meta = None
+        self._book = None
+        self._headers = {}
+        self._columns = {}
+        self._lock = threading.Lock()
+        self._reports = {}
+        self._report_locks = {}
+        self._reports_lock = threading.Lock()
+
+    def sheet(self, name, columns):
+        with self._lock:
+            columns = list(columns)
+            header = self._header(name)
+            missing = [col for col in columns if col not in header]
+            if missing:
+                raise KeyError(f"{missing} not in sheet {name!r}")
+            parsed = self._columns.setdefault(name, {})
+            wanted = [col for col in dict.fromkeys(columns) if col not in parsed]
+            if wanted and self._disk is not None:
+                parsed.update(self._disk.load_columns(self.key, name, wanted))
+                wanted = [col for col in wanted if col not in parsed]
+            if wanted:
+                parsed.update(self._stream_columns(name, header, wanted))
+                if self._disk is not None:
+                    self._disk.store_columns(self.key, name, parsed)
+            return pd.DataFrame({col: parsed[col] for col in columns})
+
+    # Output of build() memoized under key for this upload, e.g. a report or
+    # the lineage graph. Concurrent callers asking for the same key wait for a
+    # single build.
+    def cached(self, key, build):
+        with self._reports_lock:
+            lock = self._report_locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._reports:
+                self._reports[key] = build()
+            return self._reports[key]
+
+    def is_cached(self, key):
+        return key in self._reports
+
+    def sheet_names(self):
+        with self._lock:
+            meta = self._disk_meta()
+            if "sheet_names" not in meta:
+                meta["sheet_names"] = list(self._open().sheetnames)
+                self._store_meta()
+            return list(meta["sheet_names"])
+
+    # Header row of a sheet, read without parsing the rest of it
+    def columns(self, name):
+        with self._lock:
+            return list(self._header(name))
+
+    def _open(self):
+        if self._book is None:
+            self._book = load_workbook(io.BytesIO(self.data), read_only=True, data_only=True)
+        return self._book
+
+    # A sheet of the read-only workbook, sized by its actual rows. The stored
+    # <dimension> is ignored, as pd.read_excel does, because many non-Excel
+    # exporters write a wrong one and iter_rows would stop at it.
+    def _worksheet(self, name):
+        ws = self._open()[name]
+        ws.reset_dimensions()
+        return ws
+
+    def _header(self, name):
+        if name not in self._headers:
+            cached = self._disk_meta().setdefault("headers", {})
+            if name in cached:
+                self._headers[name] = cached[name]
+            else:
+                ws = self._worksheet(name)
+                first = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ())
+                self._headers[name] = cached[name] = dedupe_columns(list(first))
+                self._store_meta()
+        return self._headers[name]
+
+    def _disk_meta(self):
+        if self._meta is None:
+            self._meta = {}
+            if self._disk is not None:
+                self._disk.touch(self.key)
+                self._meta = self._disk.load_meta(self.key) or {}
+        return self._meta
+
+    def _store_meta(self):
+        if self._disk is not None:
+            self._disk.store_meta(self.key, self._meta)
+
+    def _stream_columns(self, name, header, wanted):
+        positions = [header.index(col) for col in wanted]
+        values = [[] for _ in wanted]
+        # Blank rows are only kept once a later row has data, so trailing
+        # formatted-but-empty rows are dropped as pd.read_excel does
+        pending_blank = 0
+        for row in self._worksheet(name).iter_rows(min_row=2, values_only=True):
+            if all(v is None for v in row):
+                pending_blank += 1
+                continue
+            for column in values:
+                column.extend([NAN] * pending_blank)
+            pending_blank = 0
+            width = len(row)
+            for pos, column in zip(positions, values):
+                column.append(_cell_value(row[pos]) if pos < width else NAN)
+        df = pd.DataFrame(dict(zip(wanted, values)))
+        return {col: df[col] for col in wanted}
+
+
+# Return the shared ParsedWorkbook for an upload, keyed by a hash of its content
+def get_workbook(file):
+    if isinstance(file, ParsedWorkbook):
+        return file
+    data = read_file_bytes(file)
+    key = hashlib.sha256(data).hexdigest()
+    with _cache_lock:
+        model = _cache.get(key)
+        if model is not None:
+            _cache.move_to_end(key)
+            return model
+        model = ParsedWorkbook(data, key, DISK_CACHE)
+        _cache[key] = model
+        while len(_cache) > MAX_CACHED_WORKBOOKS:
+            _cache.popitem(last=False)
+        return model
+
+
+def clear_workbook_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+from itertools import chain
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+
+# Parquet output is optional and only offered when pyarrow is installed
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+OUTPUT_FORMATS = ["xlsx", "csv"] + (["parquet"] if pyarrow is not None else [])
+
+
+# Missing values (NaN, NaT, None) are written as empty cells
+def _cell(value):
+    if value is None or value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+# Column names and a lazy row iterator for an iterable of record dicts
+def _records_table(records):
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return [], iter(())
+    columns = list(first)
+    rows = (tuple(record.get(col) for col in columns) for record in chain([first], records))
+    return columns, rows
+
+
+# Utility function to write Excel
+def write_clean_excel(df):
+    return write_clean_excel_sheets({"Sheet": df})
+
+
+# Utility function to write several DataFrames as filtered sheets of one workbook
+def write_clean_excel_sheets(sheets):
+    return write_excel_rows({
+        title: (list(df.columns), df.itertuples(index=False, name=None))
+        for title, df in sheets.items()
+    })
+
+
+# Stream (columns, rows) pairs into a write-only workbook, one sheet each, so
+# rows can come from a generator and are never all held in memory
+def write_excel_rows(sheets):
+    wb = Workbook(write_only=True)
+    for title, (columns, rows) in sheets.items():
+        ws = wb.create_sheet(title)
+        if not columns:
+            continue
+        ws.append(list(columns))
+        n_rows = 1
+        for row in rows:
+            ws.append([_cell(value) for value in row])
+            n_rows += 1
+        ws.auto_filter.ref = f"A1:{get_column_letter(len(columns))}{n_rows}"
+    output = io.BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
+def write_csv_rows(columns, rows):
+    output = io.BytesIO()
+    text = io.TextIOWrapper(output, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    if columns:
+        writer.writerow(columns)
+        writer.writerows([_cell(value) for value in row] for row in rows)
+    text.flush()
+    text.detach()
+    output.seek(0)
+    return output
+
+
+# Parquet needs one type per column, so the rows are collected into a frame
+# and mixed-type text columns are written as strings
+def write_parquet_rows(columns, rows):
+    if pyarrow is None:
+        raise RuntimeError("Parquet output requires the optional pyarrow package")
+    df = pd.DataFrame(([_cell(value) for value in row] for row in rows), columns=columns)
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].map(lambda value: None if value is None else str(value))
+    output = io.BytesIO()
+    df.to_parquet(output, index=False)
+    output.seek(0)
+    return output
+
+
+# Utility function to write a table in one of OUTPUT_FORMATS
+def write_rows(columns, rows, fmt="xlsx"):
+    if fmt == "xlsx":
+        return write_excel_rows({"Sheet": (columns, rows)})
+    if fmt == "csv":
+        return write_csv_rows(columns, rows)
+    if fmt == "parquet":
+        return write_parquet_rows(columns, rows)
+    raise ValueError(f"Unsupported output format: {fmt!r}")
+
+
+def write_frame(df, fmt="xlsx"):
+    return write_rows(list(df.columns), df.itertuples(index=False, name=None), fmt)
+
+
+# Rows are pulled from records one at a time, so a generator of lineage
+# records is written without building a list or DataFrame first
+def write_records(records, fmt="xlsx"):
+    columns, rows = _records_table(records)
+    return write_rows(columns, rows, fmt)
+
+
+# Utility function to write plain text output (used for Data Model Audit)
+def write_text_file(text):
+    output = io.BytesIO()
+    output.write(text.encode("utf-8"))
+    output.seek(0)
+    return output
+
+
+def write_json(data):
+    return write_text_file(json.dumps(data, indent=2, default=str))